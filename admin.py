@@ -1,12 +1,16 @@
 import customtkinter as ctk
 from tkinter import messagebox, filedialog
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
 import os
-import csv
 import shutil
+import threading
 from dialogs import AttendanceDialog, ScrollableDialog, AdminAccessControlDialog, ManageUserAccessDialog
 from schedule_session import ScheduleSessionDialog
+from data_manager import ConcurrentModificationError
+from export_job import ExportJob
+from query import Query
+import analytics
 
 class AdminContent(ctk.CTkFrame):
     def __init__(self, parent, current_user, is_admin=False):
@@ -556,16 +560,14 @@ class ManageRolesDialog:
         y = (self.dialog.winfo_screenheight() // 2) - (height // 2)
         self.dialog.geometry(f'+{x}+{y}')
         
+        self.data_manager = parent.data_manager
+        
         # Load users
         self.load_users()
         self.create_dialog_content()
         
     def load_users(self):
-        try:
-            with open("data/users.json", 'r') as f:
-                self.users = json.load(f)
-        except:
-            self.users = []
+        self.users = self.data_manager.get_users()
             
     def create_dialog_content(self):
         # Create main container
@@ -660,8 +662,7 @@ class ManageRolesDialog:
                 user["role"] = new_role
                 
                 # Save changes
-                with open("data/users.json", 'w') as f:
-                    json.dump(self.users, f, indent=4)
+                self.data_manager.save_users(self.users)
                     
                 messagebox.showinfo(
                     "Success", 
@@ -843,13 +844,9 @@ class ViewUsersDialog(ScrollableDialog):
             self.show_users()
             return
             
-        filtered_users = [
-            user for user in self.users
-            if search_term in user["name"].lower() or
-               search_term in user["username"].lower() or
-               search_term in user.get("email", "").lower() or
-               search_term in user.get("position", "").lower()
-        ]
+        filtered_users = Query.over(self.users, "users").search(
+            search_term, "name", "username", "email", "position"
+        ).all()
         
         self.show_users(filtered_users) 
 
@@ -861,6 +858,7 @@ class SessionReportsDialog(ScrollableDialog):
         
         # Get sessions data
         self.sessions = self.data_manager.get_sessions()
+        self.users = self.data_manager.get_users()
         
         self.create_dialog_content()
             
@@ -887,6 +885,16 @@ class SessionReportsDialog(ScrollableDialog):
         self.create_analytics_tab(analytics_tab)
         
     def create_summary_tab(self, parent):
+        ctk.CTkButton(
+            parent,
+            text="Export Summary",
+            font=ctk.CTkFont(size=12),
+            fg_color="#059669",
+            hover_color="#047857",
+            width=120,
+            command=self.export_summary
+        ).pack(anchor="e", padx=20, pady=(10, 0))
+        
         # Sessions list
         sessions_frame = ctk.CTkScrollableFrame(
             parent,
@@ -898,12 +906,8 @@ class SessionReportsDialog(ScrollableDialog):
             self.show_empty_state(sessions_frame)
             return
             
-        # Sort sessions by date
-        sorted_sessions = sorted(
-            self.sessions,
-            key=lambda x: datetime.strptime(str(x["date"]), "%Y-%m-%d"),
-            reverse=True
-        )
+        # Sessions come in chronological order, newest first here
+        sorted_sessions = list(reversed(self.sessions))
         
         for session in sorted_sessions:
             self.create_session_card(sessions_frame, session)
@@ -920,8 +924,7 @@ class SessionReportsDialog(ScrollableDialog):
         header = ctk.CTkFrame(info, fg_color="transparent")
         header.pack(fill="x")
         
-        session_date = datetime.strptime(session["date"], "%Y-%m-%d")
-        date_str = session_date.strftime("%B %d, %Y")
+        date_str = session["start"].strftime("%B %d, %Y")
         
         ctk.CTkLabel(
             header,
@@ -943,6 +946,19 @@ class SessionReportsDialog(ScrollableDialog):
             text_color="#3730a3"
         ).pack(padx=10, pady=4)
         
+        # Roll call totals
+        counts = self.data_manager.attendance_counts(session["id"])
+        if counts:
+            ctk.CTkLabel(
+                info,
+                text="   ".join(
+                    f"{status}: {counts.get(status, 0)}"
+                    for status in ["Present", "Late", "Absent", "Excused"]
+                ),
+                font=ctk.CTkFont(size=12),
+                text_color="#64748b"
+            ).pack(anchor="w", pady=(5, 0))
+        
     def show_empty_state(self, parent):
         empty_frame = ctk.CTkFrame(parent, fg_color="white", corner_radius=15)
         empty_frame.pack(fill="both", expand=True)
@@ -1000,6 +1016,16 @@ class SessionReportsDialog(ScrollableDialog):
             command=self.filter_attendance
         ).pack(side="right")
         
+        ctk.CTkButton(
+            date_frame,
+            text="Export",
+            font=ctk.CTkFont(size=12),
+            fg_color="#059669",
+            hover_color="#047857",
+            width=100,
+            command=self.export_attendance
+        ).pack(side="right", padx=10)
+        
         # Attendance table
         self.table_frame = ctk.CTkScrollableFrame(container, fg_color="white", corner_radius=10)
         self.table_frame.pack(fill="both", expand=True)
@@ -1026,42 +1052,36 @@ class SessionReportsDialog(ScrollableDialog):
             ).pack(side="left", expand=True)
             
         # Calculate attendance for each member
+        summary = self.attendance_summary(start_date, end_date)
         for user in self.users:
             if user["role"] != "Admin":  # Skip admins
-                stats = self.calculate_member_attendance(user, start_date, end_date)
+                stats = self.calculate_member_attendance(user, summary)
                 self.create_attendance_row(stats)
                 
-    def calculate_member_attendance(self, user, start_date=None, end_date=None):
+    def attendance_summary(self, start_date=None, end_date=None):
+        """(sessions, totals per member) between the two dates, inclusive"""
+        if not (start_date and end_date):
+            return self.data_manager.attendance_summary()
+            
+        return self.data_manager.attendance_summary(
+            datetime.strptime(start_date, "%Y-%m-%d").date(),
+            datetime.strptime(end_date, "%Y-%m-%d").date()
+        )
+        
+    def calculate_member_attendance(self, user, summary):
+        sessions, totals = summary
+        present, late, _, excused = totals.get(user["username"], (0, 0, 0, 0))
+        
+        # Members without a recorded status count as absent
         stats = {
             "name": user["name"],
-            "total": 0,
-            "present": 0,
-            "late": 0,
-            "absent": 0,
-            "excused": 0
+            "total": sessions,
+            "present": present,
+            "late": late,
+            "absent": sessions - present - late - excused,
+            "excused": excused
         }
         
-        for session in self.sessions:
-            session_date = datetime.fromisoformat(session["datetime"]).date()
-            
-            # Apply date filter if specified
-            if start_date and end_date:
-                start = datetime.strptime(start_date, "%Y-%m-%d").date()
-                end = datetime.strptime(end_date, "%Y-%m-%d").date()
-                if not (start <= session_date <= end):
-                    continue
-                    
-            stats["total"] += 1
-            
-            try:
-                with open(f"data/attendance_{session['datetime']}.json", 'r') as f:
-                    attendance = json.load(f)
-                    if user["username"] in attendance:
-                        status = attendance[user["username"]]["status"]
-                        stats[status.lower()] += 1
-            except:
-                stats["absent"] += 1
-                
         # Calculate attendance rate
         stats["rate"] = (stats["present"] + stats["late"]) / stats["total"] * 100 if stats["total"] > 0 else 0
         
@@ -1100,6 +1120,109 @@ class SessionReportsDialog(ScrollableDialog):
             text_color="#1e40af"
         ).pack(padx=10, pady=5)
         
+    def create_analytics_tab(self, parent):
+        container = ctk.CTkFrame(parent, fg_color="transparent")
+        container.pack(fill="both", expand=True, padx=20, pady=20)
+        
+        # Overall figures across every session with a roll call
+        recorded = 0
+        attended = 0
+        marked = 0
+        for session in self.sessions:
+            counts = self.data_manager.attendance_counts(session["id"])
+            if counts:
+                recorded += 1
+                attended += counts.get("Present", 0) + counts.get("Late", 0)
+                marked += sum(counts.values())
+                
+        figures = [
+            ("Sessions", str(len(self.sessions))),
+            ("Roll Calls Taken", str(recorded)),
+            ("Average Attendance", f"{attended / marked:.1%}" if marked else "—")
+        ]
+        
+        for i, (title, value) in enumerate(figures):
+            card = ctk.CTkFrame(container, fg_color="white", corner_radius=10)
+            card.grid(row=0, column=i, padx=10, sticky="ew")
+            container.grid_columnconfigure(i, weight=1)
+            
+            ctk.CTkLabel(
+                card,
+                text=title,
+                font=ctk.CTkFont(size=12),
+                text_color="#64748b"
+            ).pack(padx=15, pady=(15, 0))
+            
+            ctk.CTkLabel(
+                card,
+                text=value,
+                font=ctk.CTkFont(size=20, weight="bold"),
+                text_color="#000000"
+            ).pack(padx=15, pady=(0, 15))
+            
+        details = ctk.CTkFrame(container, fg_color="white", corner_radius=10)
+        details.grid(row=1, column=0, columnspan=len(figures), padx=10, pady=(20, 0), sticky="ew")
+        
+        if not analytics.available():
+            ctk.CTkLabel(
+                details,
+                text="Install NumPy for absence streaks, trends, late arrivals and vote participation",
+                font=ctk.CTkFont(size=12),
+                text_color="gray"
+            ).pack(padx=15, pady=15)
+            return
+            
+        self.create_analytics_details(details)
+        
+    def create_analytics_details(self, parent):
+        # Only sessions already held, upcoming ones would count as missed
+        now = datetime.now()
+        held = [session for session in self.sessions if session["start"] <= now]
+        members = [user for user in self.users if user["role"] != "Admin"]
+        usernames = [user["username"] for user in members]
+        
+        matrix = analytics.AttendanceMatrix.build(self.data_manager, usernames, held)
+        rates = matrix.attendance_rates()
+        _, current_streaks = matrix.absence_streaks()
+        trends = matrix.member_trends()
+        late = matrix.late_distribution(self.data_manager)
+        participation = analytics.vote_participation(self.data_manager.get_votes(), usernames)
+        
+        lines = []
+        # matrix.sessions only has the sessions a roll call was taken at
+        if matrix.sessions and members:
+            recent = matrix.rolling_rate()
+            overall = rates.mean()
+            if len(recent):
+                lines.append(f"Attendance over the last 10 sessions: {recent[-1]:.0%} (overall {overall:.0%})")
+            else:
+                lines.append(f"Overall attendance: {overall:.0%}")
+                
+            # Longest current absences first
+            for i in current_streaks.argsort()[::-1][:5]:
+                if current_streaks[i]:
+                    lines.append(
+                        f"{members[i]['name']}: missed the last {current_streaks[i]} sessions "
+                        f"(trend {trends[i]:+.0%})"
+                    )
+                    
+        if late.sum():
+            lines.append("Late arrivals: " + ", ".join(
+                f"{label} {count}" for label, count in zip(analytics.LATE_LABELS, late)
+            ))
+            
+        if len(participation) and self.data_manager.count("votes"):
+            lines.append(f"Average vote participation: {participation[:, 0].mean():.0%}")
+            
+        for line in lines or ["No attendance recorded yet"]:
+            ctk.CTkLabel(
+                parent,
+                text=line,
+                font=ctk.CTkFont(size=12),
+                text_color="#000000",
+                anchor="w"
+            ).pack(fill="x", padx=15, pady=5)
+        
     def filter_attendance(self):
         try:
             start_date = self.start_date.get().strip()
@@ -1118,78 +1241,127 @@ class SessionReportsDialog(ScrollableDialog):
             messagebox.showerror("Error", str(e))
             
     def export_summary(self):
-        try:
-            file_path = filedialog.asksaveasfilename(
-                defaultextension=".csv",
-                filetypes=[("CSV files", "*.csv")],
-                title="Export Session Summary"
-            )
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv")],
+            title="Export Session Summary"
+        )
+        if not file_path:
+            return
             
-            if file_path:
-                with open(file_path, 'w', newline='') as f:
-                    writer = csv.writer(f)
-                    writer.writerow(["Title", "Date", "Type", "Present", "Late", "Absent", "Excused"])
-                    
-                    for session in self.sessions:
-                        session_date = datetime.fromisoformat(session["datetime"])
-                        stats = {"Present": 0, "Late": 0, "Absent": 0, "Excused": 0}
-                        
-                        try:
-                            with open(f"data/attendance_{session['datetime']}.json", 'r') as af:
-                                attendance = json.load(af)
-                                for record in attendance.values():
-                                    stats[record["status"]] += 1
-                        except:
-                            pass
-                            
-                        writer.writerow([
-                            session["title"],
-                            session_date.strftime("%Y-%m-%d %H:%M"),
-                            session["type"],
-                            stats["Present"],
-                            stats["Late"],
-                            stats["Absent"],
-                            stats["Excused"]
-                        ])
-                        
-                messagebox.showinfo("Success", "Session summary exported successfully")
+        def rows():
+            for session in self.sessions:
+                stats = {"Present": 0, "Late": 0, "Absent": 0, "Excused": 0}
+                stats.update(self.data_manager.attendance_counts(session["id"]))
+                yield [
+                    session["title"],
+                    session["start"].strftime("%Y-%m-%d %H:%M"),
+                    session["type"],
+                    stats["Present"],
+                    stats["Late"],
+                    stats["Absent"],
+                    stats["Excused"]
+                ]
                 
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to export summary: {str(e)}")
+        job = ExportJob(
+            file_path,
+            ["Title", "Date", "Type", "Present", "Late", "Absent", "Excused"],
+            rows(),
+            total=len(self.sessions)
+        )
+        ExportProgressDialog(self.dialog, job, "Exporting Session Summary",
+                             "Session summary exported successfully")
             
     def export_attendance(self):
-        try:
-            file_path = filedialog.asksaveasfilename(
-                defaultextension=".csv",
-                filetypes=[("CSV files", "*.csv")],
-                title="Export Attendance Report"
-            )
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv")],
+            title="Export Attendance Report"
+        )
+        if not file_path:
+            return
             
-            if file_path:
-                with open(file_path, 'w', newline='') as f:
-                    writer = csv.writer(f)
-                    writer.writerow([
-                        "Member", "Total Sessions", "Present", "Late", 
-                        "Absent", "Excused", "Attendance Rate"
-                    ])
-                    
-                    for user in self.users:
-                        if user["role"] != "Admin":
-                            stats = self.calculate_member_attendance(user)
-                            writer.writerow([
-                                stats["name"],
-                                stats["total"],
-                                stats["present"],
-                                stats["late"],
-                                stats["absent"],
-                                stats["excused"],
-                                f"{stats['rate']:.1f}%"
-                            ])
-                            
-                messagebox.showinfo("Success", "Attendance report exported successfully")
+        members = [user for user in self.users if user["role"] != "Admin"]
+        
+        def rows():
+            summary = self.attendance_summary()
+            for user in members:
+                stats = self.calculate_member_attendance(user, summary)
+                yield [
+                    stats["name"],
+                    stats["total"],
+                    stats["present"],
+                    stats["late"],
+                    stats["absent"],
+                    stats["excused"],
+                    f"{stats['rate']:.1f}%"
+                ]
                 
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to export attendance: {str(e)}") 
+        job = ExportJob(
+            file_path,
+            ["Member", "Total Sessions", "Present", "Late", "Absent", "Excused", "Attendance Rate"],
+            rows(),
+            total=len(members)
+        )
+        ExportProgressDialog(self.dialog, job, "Exporting Attendance",
+                             "Attendance report exported successfully")
+
+class ExportProgressDialog:
+    """Runs an ExportJob, showing its progress with a Cancel button"""
+    
+    def __init__(self, parent, job, title, success_message):
+        self.job = job
+        self.success_message = success_message
+        
+        self.dialog = ctk.CTkToplevel(parent)
+        self.dialog.title(title)
+        self.dialog.geometry("400x160")
+        self.dialog.transient(parent)
+        self.dialog.grab_set()
+        self.dialog.protocol("WM_DELETE_WINDOW", self.job.cancel)
+        
+        self.status_label = ctk.CTkLabel(
+            self.dialog,
+            text="Starting export...",
+            font=ctk.CTkFont(size=12)
+        )
+        self.status_label.pack(padx=20, pady=(20, 10))
+        
+        self.progress_bar = ctk.CTkProgressBar(self.dialog, width=340)
+        self.progress_bar.set(0)
+        self.progress_bar.pack(padx=20)
+        
+        ctk.CTkButton(
+            self.dialog,
+            text="Cancel",
+            font=ctk.CTkFont(size=12),
+            fg_color="#dc2626",
+            hover_color="#b91c1c",
+            width=100,
+            command=self.job.cancel
+        ).pack(pady=20)
+        
+        self.job.start()
+        self.poll()
+        
+    def poll(self):
+        if self.job.is_alive():
+            progress = self.job.progress
+            if progress is not None:
+                self.progress_bar.set(progress)
+            self.status_label.configure(text=f"{self.job.written} rows written")
+            self.dialog.after(100, self.poll)
+            return
+            
+        self.dialog.grab_release()
+        self.dialog.destroy()
+        
+        if self.job.error:
+            messagebox.showerror("Error", f"Export failed: {str(self.job.error)}")
+        elif self.job.cancelled:
+            messagebox.showinfo("Cancelled", "Export cancelled, no file was written")
+        else:
+            messagebox.showinfo("Success", self.success_message)
 
 class ReviewDocumentsDialog:
     def __init__(self, parent):
@@ -1690,22 +1862,20 @@ class ArchiveManagementDialog:
         status = self.archived_var.get()
         search = self.search_var.get().lower()
         
-        filtered = self.archives
+        query = Query.over(self.archives, "archives")
         
         # Apply category filter
         if category != "All":
-            filtered = [d for d in filtered if d["category"] == category]
+            query.where(category=category)
             
         # Apply status filter
         if status != "All":
-            is_archived = status == "Archived"
-            filtered = [d for d in filtered if d["archived"] == is_archived]
+            query.where(archived=(status == "Archived"))
             
         # Apply search filter
-        if search:
-            filtered = [d for d in filtered if search in d["name"].lower()]
+        query.search(search, "name")
             
-        self.show_archives(filtered)
+        self.show_archives(query.all())
         
     def toggle_all(self):
         select_all = self.select_all_var.get()
@@ -2076,6 +2246,8 @@ class BackupRestoreDialog:
         y = (self.dialog.winfo_screenheight() // 2) - (height // 2)
         self.dialog.geometry(f'+{x}+{y}')
         
+        self.data_manager = parent.data_manager
+        
         # Create backup directory if it doesn't exist
         self.backup_dir = "backups"
         if not os.path.exists(self.backup_dir):
@@ -2253,26 +2425,45 @@ class BackupRestoreDialog:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             backup_path = os.path.join(self.backup_dir, f"backup_{timestamp}")
             os.makedirs(backup_path)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to create backup: {str(e)}")
+            return
             
-            # Copy data directory
-            data_path = os.path.join(backup_path, "data")
-            if os.path.exists("data"):
-                shutil.copytree("data", data_path)
+        # Copied in a worker thread from a point-in-time view of the data,
+        # so the window stays responsive and changes keep flowing meanwhile
+        result = {}
+        
+        def run_backup():
+            try:
+                self.data_manager.backup(os.path.join(backup_path, "data"))
                 
-            # Copy documents directory
-            docs_path = os.path.join(backup_path, "documents")
-            if os.path.exists("documents"):
-                shutil.copytree("documents", docs_path)
+                # Copy documents directory
+                docs_path = os.path.join(backup_path, "documents")
+                if os.path.exists("documents"):
+                    shutil.copytree("documents", docs_path)
+            except Exception as e:
+                result["error"] = e
                 
-            # Refresh backup list
-            self.load_backups()
-            self.show_backups()
-            
-            messagebox.showinfo("Success", "Backup created successfully")
+        worker = threading.Thread(target=run_backup, daemon=True)
+        worker.start()
+        self.wait_for_backup(worker, result)
+        
+    def wait_for_backup(self, worker, result):
+        if worker.is_alive():
+            self.dialog.after(100, lambda: self.wait_for_backup(worker, result))
+            return
             
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to create backup: {str(e)}")
+        if "error" in result:
+            messagebox.showerror("Error", f"Failed to create backup: {str(result['error'])}")
+            return
             
+        # Refresh backup list
+        self.load_backups()
+        self.show_backups()
+        
+        messagebox.showinfo("Success", "Backup created successfully")
+        
+
     def restore_selected(self):
         selected = [b for b in self.backups if b["selected"].get()]
         
@@ -2570,57 +2761,51 @@ class SystemLogsDialog:
             start_date = self.start_date.get().strip()
             end_date = self.end_date.get().strip()
             
-            filtered = []
-            for log in self.logs:
-                if log_type != "All" and log["description"] != log_type:
-                    continue
-                    
-                for entry in log["entries"]:
-                    # Apply level filter
-                    if level != "All" and entry["level"] != level:
-                        continue
-                        
-                    # Apply date filter
-                    if start_date and end_date:
-                        entry_date = entry["timestamp"].date()
-                        start = datetime.strptime(start_date, "%Y-%m-%d").date()
-                        end = datetime.strptime(end_date, "%Y-%m-%d").date()
-                        
-                        if not (start <= entry_date <= end):
-                            continue
-                            
-                    filtered.append(entry)
-                    
-            self.show_logs(filtered)
+            # Each log type is its own file, so it is picked before the query
+            entries = [
+                entry
+                for log in self.logs
+                if log_type == "All" or log["description"] == log_type
+                for entry in log["entries"]
+            ]
+            query = Query.over(entries, "logs").order_by("timestamp", reverse=True)
+            
+            # Apply level filter
+            if level != "All":
+                query.where(level=level)
+                
+            # Apply date filter
+            if start_date and end_date:
+                start = datetime.strptime(start_date, "%Y-%m-%d")
+                end = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
+                query.where(timestamp__gte=start, timestamp__lt=end)
+                
+            self.show_logs(query.all())
             
         except ValueError as e:
             messagebox.showerror("Error", "Invalid date format. Use YYYY-MM-DD")
             
     def export_logs(self):
-        try:
-            file_path = filedialog.asksaveasfilename(
-                defaultextension=".csv",
-                filetypes=[("CSV files", "*.csv")],
-                title="Export Logs"
-            )
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv")],
+            title="Export Logs"
+        )
+        if not file_path:
+            return
             
-            if file_path:
-                with open(file_path, 'w', newline='') as f:
-                    writer = csv.writer(f)
-                    writer.writerow(["Timestamp", "Level", "Message"])
-                    
-                    for log in self.logs:
-                        for entry in log["entries"]:
-                            writer.writerow([
-                                entry["timestamp"].strftime("%Y-%m-%d %H:%M:%S"),
-                                entry["level"],
-                                entry["message"]
-                            ])
-                            
-                messagebox.showinfo("Success", "Logs exported successfully")
-                
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to export logs: {str(e)}")
+        rows = (
+            [entry["timestamp"].strftime("%Y-%m-%d %H:%M:%S"), entry["level"], entry["message"]]
+            for log in self.logs
+            for entry in log["entries"]
+        )
+        job = ExportJob(
+            file_path,
+            ["Timestamp", "Level", "Message"],
+            rows,
+            total=sum(len(log["entries"]) for log in self.logs)
+        )
+        ExportProgressDialog(self.dialog, job, "Exporting Logs", "Logs exported successfully")
 
 class ReviewMotionsDialog:
     def __init__(self, parent):
@@ -2659,10 +2844,7 @@ class ReviewMotionsDialog:
         self.content_frame.pack(fill="both", expand=True, padx=20, pady=(0, 20))
         
         # Show pending motions
-        pending_motions = [
-            m for m in self.data_manager.get_motions()
-            if m["needs_approval"]
-        ]
+        pending_motions = self.data_manager.get_motions(status="Pending")
         
         if not pending_motions:
             self.show_empty_state()
@@ -2711,7 +2893,7 @@ class ReviewMotionsDialog:
             text="Approve",
             fg_color="#059669",
             hover_color="#047857",
-            command=lambda: self.handle_motion(motion["id"], True)
+            command=lambda: self.handle_motion(motion["id"], True, motion.get("_version", 0))
         ).pack(side="left", padx=5)
         
         ctk.CTkButton(
@@ -2719,11 +2901,18 @@ class ReviewMotionsDialog:
             text="Reject",
             fg_color="#dc2626",
             hover_color="#b91c1c",
-            command=lambda: self.handle_motion(motion["id"], False)
+            command=lambda: self.handle_motion(motion["id"], False, motion.get("_version", 0))
         ).pack(side="left", padx=5)
         
-    def handle_motion(self, motion_id, approved):
-        self.data_manager.approve_motion(motion_id, approved)
+    def handle_motion(self, motion_id, approved, version=None):
+        try:
+            # Only apply the decision to the motion as it was shown
+            self.data_manager.approve_motion(motion_id, approved, expected_version=version)
+        except ConcurrentModificationError:
+            messagebox.showwarning(
+                "Motion Changed",
+                "This motion was changed on another workstation. The list has been refreshed."
+            )
         # Refresh the list
         for widget in self.content_frame.winfo_children():
             widget.destroy()
@@ -2766,10 +2955,7 @@ class ReviewVotesDialog:
         self.content_frame.pack(fill="both", expand=True, padx=20, pady=(0, 20))
         
         # Show pending votes
-        pending_votes = [
-            v for v in self.data_manager.get_votes()
-            if v["needs_approval"]
-        ]
+        pending_votes = self.data_manager.get_votes(status="Pending")
         
         if not pending_votes:
             self.show_empty_state()
@@ -2835,7 +3021,7 @@ class ReviewVotesDialog:
             text="Approve",
             fg_color="#059669",
             hover_color="#047857",
-            command=lambda: self.handle_vote(vote["id"], True)
+            command=lambda: self.handle_vote(vote["id"], True, vote.get("_version", 0))
         ).pack(side="left", padx=5)
         
         ctk.CTkButton(
@@ -2843,11 +3029,18 @@ class ReviewVotesDialog:
             text="Reject",
             fg_color="#dc2626",
             hover_color="#b91c1c",
-            command=lambda: self.handle_vote(vote["id"], False)
+            command=lambda: self.handle_vote(vote["id"], False, vote.get("_version", 0))
         ).pack(side="left", padx=5)
         
-    def handle_vote(self, vote_id, approved):
-        self.data_manager.approve_vote(vote_id, approved)
+    def handle_vote(self, vote_id, approved, version=None):
+        try:
+            # Only apply the decision to the vote as it was shown
+            self.data_manager.approve_vote(vote_id, approved, expected_version=version)
+        except ConcurrentModificationError:
+            messagebox.showwarning(
+                "Vote Changed",
+                "This vote was changed on another workstation. The list has been refreshed."
+            )
         # Refresh the list
         for widget in self.content_frame.winfo_children():
             widget.destroy()
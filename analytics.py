@@ -0,0 +1,175 @@
+from attendance_store import CODES, NOT_RECORDED
+
+# NumPy is optional; without it the reports fall back to the attendance
+# summary and the Analytics tab says what is missing
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PRESENT = CODES["Present"]
+LATE = CODES["Late"]
+EXCUSED = CODES["Excused"]
+
+# Minutes after the start a late arrival was recorded, for the histogram
+LATE_BINS = (0, 5, 15, 30, 60, 24 * 60)
+LATE_LABELS = ("0-5 min", "5-15 min", "15-30 min", "30-60 min", "60+ min")
+
+VOTE_CHOICES = ("Yes", "No", "Abstain")
+
+
+def available():
+    return np is not None
+
+
+class AttendanceMatrix:
+    """Members x sessions attendance as a NumPy array of status codes.
+
+    Built from the attendance store in one go; every statistic is then a
+    handful of array operations over the whole history. Sessions are in
+    chronological order; only those with a roll call recorded are kept,
+    and at those members without a recorded status count as absent, as in
+    the attendance reports.
+    """
+
+    def __init__(self, codes, members, sessions):
+        self.codes = codes
+        self.members = members
+        self.sessions = sessions
+        self.attended = (codes == PRESENT) | (codes == LATE)
+
+    @classmethod
+    def build(cls, data_manager, members, sessions=None):
+        """members are usernames; sessions default to every session"""
+        if np is None:
+            raise RuntimeError("NumPy is required for attendance analytics")
+        if sessions is None:
+            sessions = data_manager.get_sessions()
+
+        store_members, columns = data_manager.attendance_columns(
+            [session["id"] for session in sessions]
+        )
+        # A session nobody took the roll for says nothing about who came
+        recorded = [i for i, column in enumerate(columns) if column is not None]
+        sessions = [sessions[i] for i in recorded]
+        columns = [columns[i] for i in recorded]
+
+        # Sessions x store members, padded where members were added later
+        table = np.full((len(sessions), len(store_members) + 1), NOT_RECORDED, dtype=np.uint8)
+        for i, column in enumerate(columns):
+            if column:
+                table[i, :len(column)] = np.frombuffer(column, dtype=np.uint8)
+
+        # Members the store has never seen point at the last, empty, column
+        positions = {username: i for i, username in enumerate(store_members)}
+        rows = np.array([positions.get(username, len(store_members)) for username in members],
+                        dtype=np.intp)
+        return cls(table[:, rows].T.copy(), list(members), sessions)
+
+    def attendance_rates(self):
+        """Share of sessions each member attended, Present or Late"""
+        if not self.sessions:
+            return np.zeros(len(self.members))
+        return self.attended.mean(axis=1)
+
+    def session_rates(self):
+        """Share of members attending each session"""
+        if not self.members:
+            return np.zeros(len(self.sessions))
+        return self.attended.mean(axis=0)
+
+    def status_counts(self):
+        """members x [present, late, absent, excused]"""
+        present = (self.codes == PRESENT).sum(axis=1)
+        late = (self.codes == LATE).sum(axis=1)
+        excused = (self.codes == EXCUSED).sum(axis=1)
+        absent = len(self.sessions) - present - late - excused
+        return np.stack([present, late, absent, excused], axis=1)
+
+    def absence_streaks(self):
+        """(longest, current) run of sessions each member missed"""
+        if not self.sessions:
+            empty = np.zeros(len(self.members), dtype=np.int64)
+            return empty, empty
+        missed = (~self.attended).astype(np.int8)
+        # +1 where a run of missed sessions starts, -1 just after it ends
+        edges = np.diff(np.pad(missed, ((0, 0), (1, 1))), axis=1)
+        start_rows, start_cols = np.nonzero(edges == 1)
+        _, end_cols = np.nonzero(edges == -1)
+        longest = np.zeros(len(self.members), dtype=np.int64)
+        np.maximum.at(longest, start_rows, end_cols - start_cols)
+
+        # The current streak runs from the last attended session to the end
+        sessions = len(self.sessions)
+        last = sessions - 1 - np.argmax(self.attended[:, ::-1], axis=1)
+        current = np.where(self.attended.any(axis=1), sessions - 1 - last, sessions)
+        return longest, current
+
+    def rolling_rate(self, window=10):
+        """House attendance rate averaged over each 'window' sessions in a row"""
+        rates = self.session_rates()
+        if len(rates) < window:
+            return rates[:0]
+        sums = np.cumsum(np.insert(rates, 0, 0.0))
+        return (sums[window:] - sums[:-window]) / window
+
+    def member_trends(self, window=10):
+        """Each member's rate over the last 'window' sessions minus their
+        overall rate, negative for members attending less lately"""
+        if not self.sessions:
+            return np.zeros(len(self.members))
+        recent = self.attended[:, -window:].mean(axis=1)
+        return recent - self.attendance_rates()
+
+    def late_distribution(self, data_manager):
+        """Counts of late arrivals per LATE_BINS bracket, from the recorded
+        times against each session's start. Roll calls saved before the
+        start or on another day say nothing about lateness and are left out"""
+        minutes = []
+        session_rows, member_rows = np.nonzero(self.codes.T == LATE)
+        times = {}
+        for session_index, member_index in zip(session_rows.tolist(), member_rows.tolist()):
+            session = self.sessions[session_index]
+            start = session.get("start")
+            if session_index not in times:
+                times[session_index] = data_manager.attendance_times(session["id"])
+            recorded = times[session_index].get(self.members[member_index])
+            if not recorded or not start:
+                continue
+            if len(recorded) > 5:
+                # "YYYY-MM-DD HH:MM"; older entries only have the time
+                if recorded[:10] != session["date"]:
+                    continue
+                recorded = recorded[11:]
+            try:
+                hour, minute = int(recorded[:2]), int(recorded[3:5])
+            except ValueError:
+                continue
+            late = (hour - start.hour) * 60 + minute - start.minute
+            if late >= 0:
+                minutes.append(late)
+
+        counts, _ = np.histogram(np.minimum(minutes, LATE_BINS[-1] - 1), bins=LATE_BINS)
+        return counts
+
+
+def vote_participation(votes, members):
+    """members x (participation rate, Yes, No, Abstain) over the given votes"""
+    if np is None:
+        raise RuntimeError("NumPy is required for vote analytics")
+    positions = {username: i for i, username in enumerate(members)}
+    choices = {choice: i for i, choice in enumerate(VOTE_CHOICES)}
+
+    # One (member, choice) pair per ballot, counted in a single bincount
+    cells = []
+    for vote in votes:
+        for voter, choice in vote.get("votes", {}).items():
+            member = positions.get(voter)
+            if member is not None and choice in choices:
+                cells.append(member * len(VOTE_CHOICES) + choices[choice])
+
+    counts = np.bincount(
+        np.array(cells, dtype=np.intp), minlength=len(members) * len(VOTE_CHOICES)
+    ).reshape(len(members), len(VOTE_CHOICES))
+    rate = counts.sum(axis=1) / len(votes) if votes else np.zeros(len(members))
+    return np.column_stack([rate, counts])
@@ -0,0 +1,281 @@
+import glob
+import json
+import os
+
+# One byte per member and session
+CODES = {"Present": ord("P"), "Late": ord("L"), "Absent": ord("A"), "Excused": ord("E")}
+STATUSES = {code: status for status, code in CODES.items()}
+NOT_RECORDED = ord(".")
+
+# Position of each status code in a rollup's [present, late, absent, excused]
+SLOTS = {code: slot for slot, code in enumerate(CODES.values())}
+
+
+class AttendanceStore:
+    """Attendance of every member at every session, in a single file.
+
+    A members x sessions matrix kept column by column: each session has a
+    bytearray holding one status code per member, in the order of
+    self.members. The whole file is read once; per-session and per-member
+    questions are then answered from memory, and counts per session are
+    kept current as attendance is recorded.
+
+    The file is data/attendance.json:
+
+        {"members": ["jdoe", ...],
+         "sessions": {"<session id>": {"codes": "PPLA.E", "times": {"jdoe": "2024-03-05 09:02"}}}}
+
+    Columns shorter than the member list (members added since) read as
+    not recorded for the missing members.
+    """
+
+    def __init__(self, path, legacy_dir=None, write_file=None):
+        self.path = path
+        # Directory holding the old data/attendance_<session>.json files,
+        # imported the first time the store is opened
+        self.legacy_dir = legacy_dir
+        self._write_file = write_file
+        self._loaded = False
+        self._signature = None
+        self.members = []
+        self._member_index = {}
+        # session id -> bytearray of codes, and -> {username: "YYYY-MM-DD HH:MM"}
+        self._columns = {}
+        self._times = {}
+        # session id -> {status: count}
+        self._counts = {}
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def load(self):
+        self.members = []
+        self._member_index = {}
+        self._columns = {}
+        self._times = {}
+        self._counts = {}
+
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            for username in data.get("members", []):
+                self._add_member(username)
+            for session_id, session in data.get("sessions", {}).items():
+                column = bytearray(session["codes"], "ascii")
+                column.extend(b"." * (len(self.members) - len(column)))
+                self._columns[session_id] = column
+                self._times[session_id] = session.get("times", {})
+                self._counts[session_id] = self._count(column)
+            self._signature = self.signature()
+            self._loaded = True
+        else:
+            self._loaded = True
+            if self._import_legacy():
+                self.write()
+
+    def _import_legacy(self):
+        """Read the per-session attendance files the store replaces"""
+        if not self.legacy_dir:
+            return False
+        prefix = os.path.join(self.legacy_dir, "attendance_")
+        imported = False
+        for path in sorted(glob.glob(prefix + "*.json")):
+            session_id = path[len(prefix):-len(".json")]
+            try:
+                with open(path, "r") as f:
+                    attendance = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Error importing {path}: {str(e)}")
+                continue
+            for username, entry in attendance.items():
+                if entry.get("status") in CODES:
+                    self._set(session_id, username, entry["status"], entry.get("time"))
+            imported = True
+        return imported
+
+    def signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def refresh(self):
+        """Re-read the file if another workstation has replaced it"""
+        if self._loaded and self.signature() != self._signature:
+            self.load()
+            return True
+        return False
+
+    def _add_member(self, username):
+        index = self._member_index.get(username)
+        if index is None:
+            index = self._member_index[username] = len(self.members)
+            self.members.append(username)
+            for column in self._columns.values():
+                column.append(NOT_RECORDED)
+        return index
+
+    def _column(self, session_id):
+        column = self._columns.get(session_id)
+        if column is None:
+            column = self._columns[session_id] = bytearray(b"." * len(self.members))
+            self._times[session_id] = {}
+            self._counts[session_id] = {}
+        return column
+
+    def _count(self, column):
+        counts = {}
+        for status, code in CODES.items():
+            count = column.count(code)
+            if count:
+                counts[status] = count
+        return counts
+
+    def _set(self, session_id, username, status, time=None):
+        index = self._add_member(username)
+        column = self._column(session_id)
+        counts = self._counts[session_id]
+        old = STATUSES.get(column[index])
+        if old is not None:
+            counts[old] -= 1
+            if not counts[old]:
+                del counts[old]
+        column[index] = CODES[status]
+        counts[status] = counts.get(status, 0) + 1
+        if time is not None:
+            self._times[session_id][username] = time
+        return old
+
+    def record(self, session_id, statuses, time=None):
+        """Set {username: status} for a session and write the store.
+
+        Returns (username, old status or None, new status) per member.
+        """
+        for status in statuses.values():
+            if status not in CODES:
+                raise ValueError(f"Unknown attendance status: {status}")
+        self._ensure_loaded()
+        changes = []
+        for username, status in statuses.items():
+            changes.append((username, self._set(session_id, username, status, time), status))
+        self.write()
+        return changes
+
+    def session(self, session_id):
+        """username -> {"status", "time"} for the members recorded at a session"""
+        self._ensure_loaded()
+        column = self._columns.get(session_id)
+        if column is None:
+            return {}
+        times = self._times[session_id]
+        return {
+            username: {"status": STATUSES[code], "time": times.get(username)}
+            for username, code in zip(self.members, column)
+            if code != NOT_RECORDED
+        }
+
+    def session_counts(self, session_id):
+        """status -> number of members recorded with it at a session"""
+        self._ensure_loaded()
+        return dict(self._counts.get(session_id, {}))
+
+    def column(self, session_id):
+        """(username, code) pairs of the members recorded at a session"""
+        self._ensure_loaded()
+        column = self._columns.get(session_id)
+        if column is None:
+            return []
+        return [(username, code) for username, code in zip(self.members, column)
+                if code != NOT_RECORDED]
+
+    def raw_columns(self, session_ids):
+        """(members, [bytes of codes or None per session]) for bulk analysis"""
+        self._ensure_loaded()
+        columns = []
+        for session_id in session_ids:
+            column = self._columns.get(session_id)
+            columns.append(bytes(column) if column is not None else None)
+        return list(self.members), columns
+
+    def times(self, session_id):
+        """username -> "YYYY-MM-DD HH:MM" the member was recorded at a session
+        (just "HH:MM" for entries recorded before the date was kept)"""
+        self._ensure_loaded()
+        return dict(self._times.get(session_id, {}))
+
+    def member_statuses(self, username, session_ids):
+        """Status of a member at each of session_ids, None where not recorded"""
+        self._ensure_loaded()
+        index = self._member_index.get(username)
+        statuses = []
+        for session_id in session_ids:
+            column = self._columns.get(session_id)
+            code = column[index] if column is not None and index is not None else NOT_RECORDED
+            statuses.append(STATUSES.get(code))
+        return statuses
+
+    def write(self):
+        content = json.dumps({
+            "members": self.members,
+            "sessions": {
+                session_id: {"codes": column.decode("ascii"), "times": self._times[session_id]}
+                for session_id, column in self._columns.items()
+            }
+        })
+        if self._write_file:
+            self._write_file(self.path, content)
+        else:
+            with open(self.path, "w") as f:
+                f.write(content)
+        self._signature = self.signature()
+
+
+class AttendanceRollups:
+    """Attendance totals per member for every month and year.
+
+    Each period holds the number of sessions in it and, per member,
+    [present, late, absent, excused]. The DataManager adds and removes
+    sessions as they are scheduled or moved and passes on each recorded
+    status, so totals for a date range come from whole years and months
+    plus at most two partial months at its edges.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        # (year,) or (year, month) -> [sessions, {username: [p, l, a, e]}]
+        self._periods = {}
+
+    def _keys(self, start):
+        return ((start.year,), (start.year, start.month))
+
+    def add_session(self, session_id, start, sign=1):
+        """Count a session and its recorded attendance, sign=-1 removes them"""
+        column = self.store.column(session_id)
+        for key in self._keys(start):
+            period = self._periods.setdefault(key, [0, {}])
+            period[0] += sign
+            counts = period[1]
+            for username, code in column:
+                member = counts.get(username)
+                if member is None:
+                    member = counts[username] = [0, 0, 0, 0]
+                member[SLOTS[code]] += sign
+
+    def change(self, start, username, old, new):
+        """A member's status at a session starting at start changed"""
+        for key in self._keys(start):
+            period = self._periods.setdefault(key, [0, {}])
+            member = period[1].get(username)
+            if member is None:
+                member = period[1][username] = [0, 0, 0, 0]
+            if old is not None:
+                member[SLOTS[CODES[old]]] -= 1
+            member[SLOTS[CODES[new]]] += 1
+
+    def period(self, key):
+        return self._periods.get(key)
+
+    def years(self):
+        return sorted(key[0] for key in self._periods if len(key) == 1)
@@ -11,8 +11,26 @@ class CalendarView(ctk.CTkToplevel):
         self.parent = parent
         self.current_date = datetime.now()
         
+        # (year, month) -> events, filled a few months at a time
+        self.events_cache = {}
+        
         self.create_calendar()
         
+        # Sessions scheduled or moved while the calendar is open
+        self.parent.data_manager.subscribe(self.on_sessions_changed, "sessions")
+        
+    def destroy(self):
+        self.parent.data_manager.unsubscribe(self.on_sessions_changed)
+        super().destroy()
+        
+    def on_sessions_changed(self, events):
+        # A change event doesn't say which months a session moved between,
+        # so drop the whole cache and redraw the month on screen
+        if not self.winfo_exists():
+            return
+        self.events_cache = {}
+        self.update_calendar()
+        
     def create_calendar(self):
         # Create controls
         controls = ctk.CTkFrame(self, fg_color="transparent")
@@ -59,11 +77,19 @@ class CalendarView(ctk.CTkToplevel):
             text=self.current_date.strftime("%B %Y")
         )
         
-        # Get events for current month
-        events = self.parent.data_manager.get_calendar_events(
-            self.current_date.year,
-            self.current_date.month
-        )
+        # Get events for current month, prefetching both neighbours so
+        # paging back and forth doesn't go to the data manager every time
+        key = (self.current_date.year, self.current_date.month)
+        if key not in self.events_cache:
+            previous = self.current_date.year * 12 + self.current_date.month - 2
+            self.events_cache.update(
+                self.parent.data_manager.get_calendar_events_range(
+                    previous // 12,
+                    previous % 12 + 1,
+                    months=3
+                )
+            )
+        events = self.events_cache[key]
         
         # Create calendar grid
         self.create_calendar_grid(events)
@@ -92,10 +118,20 @@ class CalendarView(ctk.CTkToplevel):
         for i in range(7):
             grid.grid_columnconfigure(i, weight=1)
             
+        # Group events by day of month once for all cells
+        events_by_day = {}
+        for event in events:
+            # "start" is already parsed unless the session time is invalid
+            if event["start"]:
+                day = event["start"].day
+            else:
+                day = datetime.strptime(event["date"], "%Y-%m-%d").day
+            events_by_day.setdefault(day, []).append(event)
+            
         # Create day cells
         for week_num, week in enumerate(cal):
             for day_num, day in enumerate(week):
-                cell = self.create_day_cell(grid, day, week_num, day_num, events)
+                cell = self.create_day_cell(grid, day, week_num, day_num, events_by_day.get(day, []))
                 cell.grid(row=week_num, column=day_num, sticky="nsew", padx=2, pady=2)
                 
     def create_day_cell(self, parent, day, week, col, events):
@@ -121,14 +157,8 @@ class CalendarView(ctk.CTkToplevel):
         )
         date_label.pack(anchor="w", padx=8, pady=5)
         
-        # Find events for this day
-        day_events = [
-            event for event in events
-            if datetime.strptime(event["date"], "%Y-%m-%d").day == day
-        ]
-        
         # Show events
-        for event in day_events:
+        for event in events:
             self.create_event_indicator(cell, event)
             
         return cell
@@ -8,7 +8,6 @@ from voting import VotingContent
 from chat import ChatContent
 from motion import MotionContent
 from documents import DocumentContent
-from datetime import datetime
 from signout import SignOut
 
 class DashboardContent(ctk.CTkFrame):
@@ -19,9 +18,53 @@ class DashboardContent(ctk.CTkFrame):
         
         self.parent = parent  # Store parent reference to access data_manager
         
+        # Widgets patched when the data changes, see on_data_changed
+        self.metric_labels = {}
+        self.events_list = None
+        
         self.create_header()
         self.create_content()
         
+        self.parent.data_manager.subscribe(self.on_data_changed)
+        
+    def destroy(self):
+        self.parent.data_manager.unsubscribe(self.on_data_changed)
+        super().destroy()
+        
+    def on_data_changed(self, events):
+        """Refresh only the parts of the dashboard affected by the changes"""
+        if not self.winfo_exists():
+            return
+        changed = {event.collection for event in events}
+        if changed & {"bills", "motions", "users", "attendance", "sessions"}:
+            self.refresh_metrics()
+        if "sessions" in changed:
+            self.refresh_upcoming_events()
+            
+    def refresh(self):
+        self.refresh_metrics()
+        self.refresh_upcoming_events()
+        
+    def refresh_metrics(self):
+        for title, value in self.metric_values().items():
+            self.metric_labels[title].configure(text=value)
+            
+    def metric_values(self):
+        """Current value of each key metric, read from the data manager's
+        aggregates rather than by going through the records"""
+        data_manager = self.parent.data_manager
+        bill_counts = data_manager.status_counts("bills")
+        attendance = data_manager.today_attendance()
+        return {
+            "Active Members": str(data_manager.active_member_count()),
+            "Bills in Progress": str(sum(
+                count for status, count in bill_counts.items()
+                if status not in ("Passed", "Rejected")
+            )),
+            "Pending Motions": str(data_manager.count("motions", status="Pending")),
+            "Today's Attendance": f"{attendance:.0%}" if attendance is not None else "—"
+        }
+        
     def create_header(self):
         header_frame = ctk.CTkFrame(
             self,
@@ -96,17 +139,18 @@ class DashboardContent(ctk.CTkFrame):
         metrics_frame = ctk.CTkFrame(parent, fg_color="transparent")
         metrics_frame.pack(fill="x", pady=(0, 30))
         
+        values = self.metric_values()
         metrics = [
             {
                 "title": "Active Members",
-                "value": "245",
+                "value": values["Active Members"],
                 "change": "+2",
                 "color": "#10b981",
                 "icon": "👥"
             },
             {
                 "title": "Bills in Progress",
-                "value": str(len(self.parent.data_manager.get_bills())),
+                "value": values["Bills in Progress"],
                 "change": "+3",
                 "color": "#6366f1",
                 "icon": "📜",
@@ -114,14 +158,14 @@ class DashboardContent(ctk.CTkFrame):
             },
             {
                 "title": "Pending Motions",
-                "value": "8",
+                "value": values["Pending Motions"],
                 "change": "-1",
                 "color": "#f59e0b",
                 "icon": "⚖️"
             },
             {
                 "title": "Today's Attendance",
-                "value": "92%",
+                "value": values["Today's Attendance"],
                 "change": "+5%",
                 "color": "#8b5cf6",
                 "icon": "📊"
@@ -173,6 +217,7 @@ class DashboardContent(ctk.CTkFrame):
                 text_color="#000000"
             )
             value_label.pack(side="left")
+            self.metric_labels[metric["title"]] = value_label
             
             change_color = "#10b981" if "+" in metric["change"] else "#ef4444"
             change_frame = ctk.CTkFrame(
@@ -267,14 +312,20 @@ class DashboardContent(ctk.CTkFrame):
         ).pack(side="left")
         
         # Events list
-        events_list = ctk.CTkFrame(events_frame, fg_color="transparent")
-        events_list.pack(fill="both", expand=True, padx=20, pady=(0, 20))
+        self.events_list = ctk.CTkFrame(events_frame, fg_color="transparent")
+        self.events_list.pack(fill="both", expand=True, padx=20, pady=(0, 20))
+        
+        self.refresh_upcoming_events()
         
+    def refresh_upcoming_events(self):
+        for child in self.events_list.winfo_children():
+            child.destroy()
+            
         # Get upcoming sessions from data manager
         upcoming_sessions = self.parent.data_manager.get_upcoming_sessions()
         
         for session in upcoming_sessions:
-            self.create_event_item(events_list, session)
+            self.create_event_item(self.events_list, session)
         
     def create_event_item(self, parent, event):
         item = ctk.CTkFrame(parent, fg_color="transparent", height=60)
@@ -282,7 +333,7 @@ class DashboardContent(ctk.CTkFrame):
         item.pack_propagate(False)
         
         # Date indicator
-        date = datetime.strptime(event["date"], "%Y-%m-%d")
+        date = event["start"]
         date_frame = ctk.CTkFrame(item, fg_color="#e0e7ff", width=50, corner_radius=8)
         date_frame.pack(side="left")
         date_frame.pack_propagate(False)
@@ -558,10 +609,10 @@ class AssemblyDashboard(ctk.CTkFrame):
 
     def update_dashboard(self):
         """Update dashboard content when data changes"""
+        # The dashboard follows data manager change events; this only
+        # forces an immediate refresh of the parts that depend on data
         if isinstance(self.current_content, DashboardContent):
-            self.current_content.destroy()
-            self.current_content = DashboardContent(self)
-            self.current_content.grid(row=0, column=1, sticky="nsew")
+            self.current_content.refresh()
 
 if __name__ == "__main__":
     app = AssemblyDashboard()
@@ -1,205 +1,1527 @@
 import json
 import os
-from datetime import datetime
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections.abc import Hashable, Mapping
+from contextlib import contextmanager, nullcontext
+from datetime import date, datetime, timedelta
+from itertools import chain, islice
+from attendance_store import SLOTS, AttendanceRollups, AttendanceStore
+from events import ChangeEvent, EventBus
+from journal import Journal
+from json_stream import iter_json_object
+from locking import FileLock
+from persistence import PersistenceWorker
+from query import AccessPath, Query
+from read_view import ReadView
+from records import Record, SessionRecord, make_record
+from segments import DEFAULT_BUDGET, SegmentedStore
+from snapshot import SnapshotError, SnapshotReader, SnapshotTable, write_snapshot
+from sqlite_store import SQLiteStore
+
+# Collections persisted by the DataManager, one JSON file each
+COLLECTIONS = ("sessions", "motions", "votes", "bills")
+
+# Collections indexed by their "status" field
+STATUS_INDEXED = ("motions", "votes", "bills")
+
+# Collections that can be indexed by their "created_by" field, see query()
+# and _owner_key()
+OWNER_INDEXED = ("motions", "votes", "bills")
+
+# Attendance statuses that count as attended, see attendance_store.py
+# for all of them
+ATTENDED = ("Present", "Late")
 
 class DateTimeEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, datetime):
             return obj.strftime("%Y-%m-%d %H:%M:%S")
+        if isinstance(obj, Record):
+            return dict(obj)
         return super().default(obj)
 
+class ConcurrentModificationError(Exception):
+    """A record changed since the version the caller based its change on"""
+
+    def __init__(self, collection, record_id, expected, actual):
+        super().__init__(
+            f"{collection} record {record_id} is at version {actual}, expected {expected}"
+        )
+        self.collection = collection
+        self.record_id = record_id
+        self.expected = expected
+        self.actual = actual
+
+class RecordView(Mapping):
+    """Read-only view of a stored record plus its "id".
+
+    Nothing is copied; an optional field projection limits the keys that
+    are visible through the view.
+    """
+
+    __slots__ = ("id", "_record", "_fields")
+
+    def __init__(self, record_id, record, fields=None):
+        self.id = record_id
+        self._record = record
+        self._fields = fields
+
+    def __getitem__(self, key):
+        if key == "id":
+            return self.id
+        if self._fields is not None and key not in self._fields:
+            raise KeyError(key)
+        return self._record[key]
+
+    def __iter__(self):
+        yield "id"
+        for key in self._record:
+            if key != "id" and (self._fields is None or key in self._fields):
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"RecordView({dict(self)!r})"
+
+class JsonStore:
+    """Storage engine keeping each collection in data/<collection>.json"""
+
+    # serialize() needs every record, not just the changed ones
+    rewrites_collection = True
+    # signature() identifies each file, so a binary snapshot can be checked
+    snapshots = True
+
+    def __init__(self, data_dir="data"):
+        self.data_dir = data_dir
+
+    def load(self, name):
+        return dict(self.iter_load(name))
+
+    def iter_load(self, name):
+        """Yield (id, record) pairs, parsing the file one record at a time"""
+        path = os.path.join(self.data_dir, f"{name}.json")
+        if not os.path.exists(path):
+            with open(path, "w") as f:
+                json.dump({}, f)
+            return
+        yield from iter_json_object(path)
+
+    def serialize(self, name, records, record_ids):
+        # A JSON file can only be rewritten as a whole
+        return json.dumps(records, cls=DateTimeEncoder)
+
+    def signature(self, name):
+        """(mtime, size) of a collection file, identifies its current contents"""
+        try:
+            stat = os.stat(os.path.join(self.data_dir, f"{name}.json"))
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def change_token(self, name):
+        # Every write replaces the file, so the signature moves with it
+        return self.signature(name)
+
+    def write(self, name, content):
+        self.write_file(os.path.join(self.data_dir, f"{name}.json"), content)
+
+    def write_file(self, path, content):
+        # Write a temp file and rename it over the old one, so a crash
+        # leaves either the old or the new file, never a truncated one
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self._sync_dir(os.path.dirname(path) or ".")
+
+    def _sync_dir(self, directory):
+        # Make the rename itself durable, directories can't be opened on Windows
+        if os.name != "posix":
+            return
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def close(self):
+        pass
+
+def _id_path(index, ids, order=None):
+    return AccessPath(
+        index, len(ids), lambda reverse=False: reversed(ids) if reverse else iter(ids), order
+    )
+
+class CollectionSource:
+    """A DataManager collection as the source of a Query, see DataManager.query()"""
+
+    def __init__(self, data_manager, name):
+        self.data_manager = data_manager
+        self.name = name
+        self.records = getattr(data_manager, name)
+
+    def access_paths(self, conditions):
+        return self.data_manager._access_paths(self.name, conditions)
+
+    def scan_path(self):
+        return _id_path("full scan", list(self.records))
+
+    def get(self, record_id):
+        return self.records[record_id]
+
+    def value(self, record, field):
+        if field == "start" and self.name == "sessions":
+            return self.data_manager._session_start(record)
+        return record.get(field)
+
+    def result(self, record_id, record):
+        if self.name == "sessions":
+            return self.data_manager._session_copy(self.records, record_id)
+        return {**record, "id": record_id}
+
 class DataManager:
-    def __init__(self):
-        self.sessions = {}
-        self.motions = {}
-        self.votes = {}
-        self.bills = {}
-        
+    def __init__(self, journaled=False, journal_threshold=1024 * 1024, backend="json",
+                 commit_window=0.0, async_writes=False, max_pending_flushes=64,
+                 snapshot_path=None, shared=False, segment_budget=DEFAULT_BUDGET):
+        started = time.perf_counter()
+
+        # Collections are read from disk the first time they are used
+        self._collections = {}
+        # Seconds spent loading each collection, for startup diagnostics
+        self.load_times = {}
+
+        # Guards the collections against the writer and compactor threads
+        self._lock = threading.RLock()
+        # Serializes disk writes so batches reach the store in order. A
+        # transaction holds it throughout, so it has to be reentrant
+        self._write_lock = threading.RLock()
+        self._compactor = None
+
+        # IDs of records changed since each collection was last written
+        self._dirty = {name: set() for name in COLLECTIONS}
+        # IDs of records changed by the open transaction, see _pin()
+        self._pinned = {name: set() for name in COLLECTIONS}
+
+        # status -> IDs for each status indexed collection. The IDs are kept
+        # as dict keys, which gives an insertion ordered set
+        self._status_index = {name: {} for name in STATUS_INDEXED}
+
+        # created_by -> IDs, built the first time a query filters on it
+        self._owner_index = {}
+
+        # Sessions ordered by start time, as two parallel sorted lists
+        self._session_times = []
+        self._session_ids = []
+
+        # (year, month) -> IDs of the sessions held in that month
+        self._month_index = {}
+
+        # Aggregates kept current on each change, so the dashboard reads
+        # them without scanning: users and the number of active members
+        # (attendance counts per session are kept by the attendance store)
+        self._users = None
+        self._active_members = 0
+
+        # Change notifications for the views, see subscribe()
+        self.events = EventBus()
+
+        # Binary snapshot the collections are opened from when it is current
+        self.snapshot_path = snapshot_path
+        self._snapshot = None
+        self._modified = False
+
+        # Group commit: mutations within commit_window seconds of each
+        # other are written together by a single flush
+        self.commit_window = commit_window
+        self._commit_timer = None
+        self._pending_entries = []
+
+        # Open read views, told about each record before it changes
+        self._views = []
+
+        # (entry, previous record, event) for each change of the open
+        # transaction, one per thread, see transaction(). Changes made on
+        # other threads wait on _transaction_lock until it has ended
+        self._local = threading.local()
+        self._transaction_lock = threading.RLock()
+
         # Create data directory if it doesn't exist
         if not os.path.exists("data"):
             os.makedirs("data")
-            
+
+        # Workstations sharing the data directory take turns through a lock
+        # file, and pick up each other's changes before making their own
+        self._file_lock = FileLock(os.path.join("data", ".lock")) if shared else None
+        # Store change token of each collection as of our last read/write
+        self._tokens = {}
+        # How far into the journal other workstations' entries were read
+        self._journal_position = (None, 0)
+
+        # Other files in the data directory (users, attendance) are
+        # replaced atomically the same way as the JSON collections
+        self._files = JsonStore("data")
+
+        # Members x sessions attendance matrix, read on first use
+        self.attendance = AttendanceStore(
+            os.path.join("data", "attendance.json"),
+            legacy_dir="data",
+            write_file=self._files.write_file
+        )
+        # Per member totals by month and year, built on first use
+        self._rollups = None
+
+        # Storage engine holding the collections on disk
+        if backend == "sqlite":
+            self.store = SQLiteStore("data/hoaa.db", COLLECTIONS, encoder=DateTimeEncoder)
+        elif backend == "json":
+            self.store = JsonStore("data")
+        elif backend == "segmented":
+            # Only the current year stays in memory, see segments.py
+            self.store = SegmentedStore(
+                JsonStore("data"), encoder=DateTimeEncoder, budget=segment_budget,
+                file_lock=self._file_lock
+            )
+        else:
+            raise ValueError(f"Unknown storage backend: {backend}")
+
+        # In journaled mode mutations are appended to a log instead of
+        # rewriting every collection file
+        self.journal = None
+        if journaled:
+            self.journal = Journal(
+                "data/journal.log",
+                encoder=DateTimeEncoder,
+                compact_threshold=journal_threshold
+            )
+            # Collections are loaded with a full replay, only later entries
+            # need to be picked up from the tail
+            self._journal_position = self.journal.position()
+
         self.load_data()
-        
+
+        # In async mode a writer thread does all serialization and disk I/O.
+        # Shared data is written as each change is made (see _commit_many),
+        # so there it would only move sync() and its events off this thread
+        self._writer = None
+        if async_writes and not shared:
+            self._writer = PersistenceWorker(
+                self._write_pending,
+                max_pending=max_pending_flushes,
+                window=commit_window
+            )
+            self._writer.start()
+
+        self.startup_time = time.perf_counter() - started
+
+    @property
+    def sessions(self):
+        return self._collection("sessions")
+
+    @property
+    def motions(self):
+        return self._collection("motions")
+
+    @property
+    def votes(self):
+        return self._collection("votes")
+
+    @property
+    def bills(self):
+        return self._collection("bills")
+
+    @property
+    def _transaction(self):
+        return getattr(self._local, "transaction", None)
+
+    @_transaction.setter
+    def _transaction(self, changes):
+        self._local.transaction = changes
+
     def load_data(self):
-        # Load sessions
-        try:
-            if os.path.exists("data/sessions.json"):
-                with open("data/sessions.json", "r") as f:
-                    content = f.read()
-                    self.sessions = json.loads(content) if content else {}
+        """Forget the loaded collections, they are re-read on next use"""
+        with self._lock:
+            self._collections = {}
+            self._snapshot = None
+            self._tokens = {}
+            self._users = None
+            self._rollups = None
+            self.attendance.refresh()
+            for name in COLLECTIONS:
+                self._dirty[name].clear()
+
+    def _collection(self, name):
+        records = self._collections.get(name)
+        if records is None:
+            with self._lock:
+                records = self._collections.get(name)
+                if records is None:
+                    records = self._load(name)
+        return records
+
+    def _load(self, name):
+        started = time.perf_counter()
+        if self._file_lock:
+            # Taken before reading, so a write racing the read is seen by sync()
+            self._tokens[name] = self.store.change_token(name)
+        table = self._snapshot_table(name)
+        if table is None and hasattr(self.store, "table"):
+            table = self.store.table(name, lambda record: make_record(name, record))
+            if table is not None:
+                # Segments holding unsaved changes must stay in memory
+                table.dirty = self._dirty[name]
+                table.pinned = self._pinned[name]
+        if table is not None:
+            records = self._collections[name] = table
+            if name in self._status_index and hasattr(table, "status_index"):
+                # The snapshot carries the status index, it is read from
+                # the file as it is used instead of being built
+                self._owner_index.pop(name, None)
+                self._status_index[name] = table.status_index()
             else:
-                with open("data/sessions.json", "w") as f:
-                    json.dump({}, f)
-        except Exception as e:
-            print(f"Error loading sessions: {str(e)}")
-            self.sessions = {}
-                
-        # Load motions
+                # Snapshot and segmented tables can hand out the indexed
+                # fields without reading every record
+                self._build_indexes(name, list(table.index_items()))
+        else:
+            # Records are indexed as they come off the disk
+            records = self._collections[name] = {}
+            self._build_indexes(name, self._stream_collection(name, records))
+
+        # Replay mutations made since the last snapshot
+        if self.journal:
+            for entry in self.journal.replay():
+                if entry["collection"] == name:
+                    self._apply_entry(entry)
+                    self._mark_dirty(name, entry["id"])
+
+        self.load_times[name] = time.perf_counter() - started
+        return records
+
+    def _build_indexes(self, name, items):
+        """Index (id, record) pairs in a single pass over items"""
+        self._owner_index.pop(name, None)
+        if name in self._status_index:
+            self._status_index[name].clear()
+            for record_id, record in items:
+                self._index_record(name, record_id, record)
+        elif name == "sessions":
+            self._month_index.clear()
+            self._rollups = None
+            # Sort the sessions once instead of inserting them one by one
+            ordered = []
+            for session_id, session in items:
+                start = self._session_start(session)
+                if start:
+                    ordered.append((start, session_id))
+                self._index_session_month(session_id, session)
+            ordered.sort()
+            self._session_times = [start for start, _ in ordered]
+            self._session_ids = [session_id for _, session_id in ordered]
+        else:
+            # Nothing to index, but items still has to be drained to load
+            for _ in items:
+                pass
+
+    def _index_record(self, name, record_id, record):
+        if name in self._owner_index:
+            self._owner_index[name].setdefault(_owner_key(record.get("created_by")), {})[record_id] = None
+        if name in self._status_index:
+            self._status_index[name].setdefault(record.get("status"), {})[record_id] = None
+        elif name == "sessions":
+            start = self._session_start(record)
+            if start:
+                position = bisect_right(self._session_times, start)
+                self._session_times.insert(position, start)
+                self._session_ids.insert(position, record_id)
+                if self._rollups is not None:
+                    self._rollups.add_session(record_id, start)
+            self._index_session_month(record_id, record)
+
+    def _unindex_record(self, name, record_id, record):
+        if name in self._owner_index:
+            ids = self._owner_index[name].get(_owner_key(record.get("created_by")))
+            if ids is not None:
+                ids.pop(record_id, None)
+        if name in self._status_index:
+            ids = self._status_index[name].get(record.get("status"))
+            if ids is not None:
+                ids.pop(record_id, None)
+        elif name == "sessions":
+            start = self._session_start(record)
+            if start:
+                position = bisect_left(self._session_times, start)
+                end = bisect_right(self._session_times, start)
+                for i in range(position, end):
+                    if self._session_ids[i] == record_id:
+                        del self._session_times[i]
+                        del self._session_ids[i]
+                        if self._rollups is not None:
+                            self._rollups.add_session(record_id, start, sign=-1)
+                        break
+            month = self._session_month(record)
+            if month in self._month_index:
+                self._month_index[month].pop(record_id, None)
+
+    def _index_session_month(self, session_id, session):
+        month = self._session_month(session)
+        if month:
+            self._month_index.setdefault(month, {})[session_id] = None
+
+    def _session_month(self, session):
+        if isinstance(session, SessionRecord) and session.start:
+            return (session.start.year, session.start.month)
         try:
-            if os.path.exists("data/motions.json"):
-                with open("data/motions.json", "r") as f:
-                    content = f.read()
-                    motions_data = json.loads(content) if content else {}
-                    # Convert date strings back to datetime objects
-                    for motion_id, motion in motions_data.items():
-                        if "date" in motion:
-                            try:
-                                motion["date"] = datetime.strptime(motion["date"], "%Y-%m-%d %H:%M:%S")
-                            except ValueError:
-                                # Handle invalid date format
-                                motion["date"] = datetime.now()
-                    self.motions = motions_data
-            else:
-                with open("data/motions.json", "w") as f:
-                    json.dump({}, f)
-                self.motions = {}
-        except Exception as e:
-            print(f"Error loading motions: {str(e)}")
-            self.motions = {}
-                
-        # Load votes
+            date = datetime.strptime(session["date"], "%Y-%m-%d")
+        except (KeyError, ValueError):
+            return None
+        return (date.year, date.month)
+
+    def _session_start(self, session):
+        if isinstance(session, SessionRecord):
+            return session.start
         try:
-            if os.path.exists("data/votes.json"):
-                with open("data/votes.json", "r") as f:
-                    content = f.read()
-                    self.votes = json.loads(content) if content else {}
-            else:
-                with open("data/votes.json", "w") as f:
-                    json.dump({}, f)
-                self.votes = {}
+            return datetime.strptime(f"{session['date']} {session['time']}", "%Y-%m-%d %H:%M")
+        except (KeyError, ValueError):
+            return None
+
+    def _stream_collection(self, name, records):
+        """Read a collection from the store into records, yielding each record"""
+        try:
+            # Dates stay as strings until a record is read, see records.py
+            for record_id, record in self.store.iter_load(name):
+                record = records[record_id] = make_record(name, record)
+                yield record_id, record
         except Exception as e:
-            print(f"Error loading votes: {str(e)}")
-            self.votes = {}
-                
-        # Load bills
+            print(f"Error loading {name}: {str(e)}")
+
+    def _snapshot_table(self, name):
+        """The collection from the binary snapshot, if it is still current"""
+        if not self.snapshot_path:
+            return None
         try:
-            if os.path.exists("data/bills.json"):
-                with open("data/bills.json", "r") as f:
-                    content = f.read()
-                    bills_data = json.loads(content) if content else {}
-                    # Convert date strings back to datetime objects
-                    for bill_id, bill in bills_data.items():
-                        if "date" in bill:
-                            try:
-                                bill["date"] = datetime.strptime(bill["date"], "%Y-%m-%d %H:%M:%S")
-                            except ValueError:
-                                bill["date"] = datetime.now()
-                    self.bills = bills_data
+            if self._snapshot is None:
+                if not os.path.exists(self.snapshot_path):
+                    return None
+                self._snapshot = SnapshotReader(self.snapshot_path)
+            signature = self.store.signature(name)
+            if (name not in self._snapshot.collections
+                    or signature is None
+                    or self._snapshot.signature(name) != signature):
+                # Out of date, have close() write a fresh one
+                self._modified = True
+                return None
+            return self._snapshot.table(name, lambda record: make_record(name, record))
+        except (OSError, ValueError, SnapshotError) as e:
+            print(f"Error opening snapshot: {str(e)}")
+            # E.g. a snapshot in an older format, replaced on close()
+            self._modified = True
+            return None
+
+    def write_snapshot(self):
+        """Write every collection to the binary snapshot file"""
+        if not self.snapshot_path:
+            return False
+
+        # The snapshot has to match the store files it is checked against
+        with self._exclusive():
+            return self._write_snapshot()
+
+    def _write_snapshot(self):
+        # Storage engines that can't tell whether a snapshot is current
+        # never get one; find out before flushing and reading every
+        # collection for nothing
+        if not self.store.snapshots:
+            return False
+        self.flush()
+        self.compact()
+        if self._file_lock:
+            self._sync()
+        with self._write_lock, self._lock:
+            collections = {name: self._collection(name) for name in COLLECTIONS}
+            signatures = {name: self.store.signature(name) for name in COLLECTIONS}
+            if None in signatures.values():
+                # The storage engine can't tell whether a snapshot is current
+                return False
+            if self._snapshot is not None:
+                # Every record is decoded for the write anyway; let go of the
+                # old mapping so the file can be replaced (Windows won't
+                # replace a mapped file)
+                for name, records in collections.items():
+                    if isinstance(records, SnapshotTable):
+                        collections[name] = self._collections[name] = dict(records)
+                        if name in self._status_index:
+                            self._status_index[name] = {
+                                status: dict(ids) for status, ids in self._status_index[name].items()
+                            }
+                self._snapshot.close()
+                self._snapshot = None
+            write_snapshot(self.snapshot_path, collections, signatures)
+            self._modified = False
+        return True
+
+    def save_data(self):
+        """Write the collections that changed since the last save"""
+        with self._exclusive():
+            if self._file_lock:
+                self._sync()
+            with self._write_lock:
+                with self._lock:
+                    batch = self._take_dirty()
+                self._write_batch(batch)
+
+    def dirty_collections(self):
+        """Names of collections with unsaved changes"""
+        return [name for name in COLLECTIONS if self._dirty[name]]
+
+    def dirty_records(self, name):
+        """IDs of records in a collection with unsaved changes"""
+        return set(self._dirty[name])
+
+    def _mark_dirty(self, name, record_id):
+        self._dirty[name].add(record_id)
+
+    def _take_dirty(self):
+        """Copy out the dirty records and reset the dirty sets.
+
+        Must be called with the lock held. Only the copy is serialized, so
+        the lock is not held while JSON is being produced.
+        """
+        batch = {}
+        for name in self.dirty_collections():
+            records = self._collections[name]
+            record_ids = set(self._dirty[name])
+            if hasattr(records, "segment_copies"):
+                # Only the hot file and the segments holding changes
+                copied = records.segment_copies(record_ids)
+            elif self.store.rewrites_collection:
+                copied = {rid: dict(record) for rid, record in records.items()}
             else:
-                with open("data/bills.json", "w") as f:
-                    json.dump({}, f)
-                self.bills = {}
+                copied = {rid: dict(records[rid]) for rid in record_ids if rid in records}
+            batch[name] = (copied, record_ids)
+            self._dirty[name].clear()
+        return batch
+
+    def _write_batch(self, batch):
+        for name, (records, record_ids) in batch.items():
+            try:
+                self.store.write(name, self.store.serialize(name, records, record_ids))
+            except Exception:
+                # Keep the records dirty so the next flush retries them
+                with self._lock:
+                    self._dirty[name].update(record_ids)
+                raise
+            if self._file_lock:
+                # Our own write is not a change to pick up in sync()
+                self._tokens[name] = self.store.change_token(name)
+
+    def _commit(self, entry):
+        """Persist a single mutation"""
+        self._commit_many([entry])
+
+    def _commit_many(self, entries):
+        """Persist mutations together, as one journal entry"""
+        with self._lock:
+            self._modified = True
+            for entry in entries:
+                self._mark_dirty(entry["collection"], entry["id"])
+            if self.journal:
+                if len(entries) == 1:
+                    self._pending_entries.append(entries[0])
+                else:
+                    self._pending_entries.append({"op": "batch", "entries": entries})
+
+            if self._file_lock:
+                # Other workstations must see the change before the lock is
+                # released, so shared data is written right away
+                pass
+            elif self._writer:
+                self._writer.request()
+                return
+            elif self.commit_window > 0:
+                if not self._commit_timer:
+                    self._commit_timer = threading.Timer(self.commit_window, self._write_pending)
+                    self._commit_timer.start()
+                return
+
+        # _write_pending takes the write lock first, so call it unlocked
+        self._write_pending()
+
+    def flush(self, timeout=None):
+        """Write every pending mutation and wait until it is on disk.
+
+        Returns False on timeout, and straight away inside a transaction:
+        the writer would wait for the transaction, whose changes are
+        written when it ends.
+        """
+        if self._transaction is not None:
+            return False
+        if self._writer:
+            return self._writer.flush(timeout)
+        self._write_pending()
+        return True
+
+    def flush_stats(self):
+        """Flush counts and latencies (in seconds) of the writer thread"""
+        if self._writer:
+            return self._writer.stats()
+        return None
+
+    def close(self):
+        """Flush outstanding writes and release the storage engine"""
+        if self._writer:
+            self._writer.stop()
+            self._writer = None
+        self._write_pending()
+        if self._compactor:
+            self._compactor.join()
+
+        # Refresh the snapshot so the next start can open it directly
+        if self.snapshot_path and (self._modified or not os.path.exists(self.snapshot_path)):
+            try:
+                self.write_snapshot()
+            except (OSError, SnapshotError) as e:
+                print(f"Error writing snapshot: {str(e)}")
+        self.store.close()
+        if self._file_lock:
+            self._file_lock.close()
+
+    def _exclusive(self):
+        """The shared data lock, or a no-op when the data isn't shared"""
+        return self._file_lock or nullcontext()
+
+    def sync(self, blocking=True):
+        """Pick up changes other workstations made to the shared data.
+
+        Cheap when nothing changed: a stat per loaded collection and one of
+        the journal. Returns False if blocking is False and another
+        workstation holds the lock.
+        """
+        if not self._file_lock:
+            return True
+        if not self._file_lock.acquire(blocking):
+            return False
+        try:
+            self._sync()
+        finally:
+            self._file_lock.release()
+        return True
+
+    def _sync(self):
+        # Called with the file lock held
+        events = []
+        with self._lock:
+            reloaded = False
+            for name in list(self._collections):
+                token = self.store.change_token(name)
+                if token == self._tokens.get(name):
+                    continue
+                if hasattr(self.store, "refresh"):
+                    # Archived records are only known by their index rows
+                    self._refresh_cold(name, events)
+                # Only records with a newer version than ours are taken
+                for record_id, record in self.store.iter_load(name):
+                    entry = {"op": "put", "collection": name, "id": record_id, "record": record}
+                    self._merge_entry(entry, events, dirty=False)
+                self._tokens[name] = token
+                reloaded = True
+
+            if self.journal:
+                # Rewritten collection files mean another workstation has
+                # compacted the journal; read the fresh log from the start
+                position = (None, 0) if reloaded else self._journal_position
+                entries, self._journal_position, _ = self.journal.read_since(position)
+                for entry in entries:
+                    # Kept dirty so our next compaction writes them out
+                    self._merge_entry(entry, events, dirty=True)
+
+            # Attendance taken on another workstation
+            if self.attendance.refresh():
+                self._rollups = None
+                events.append(ChangeEvent("attendance", None, "updated", None, None))
+
+        for event in events:
+            self.events.publish(event)
+
+    def _refresh_cold(self, name, events):
+        """Re-index archived records another workstation changed"""
+        changes = self.store.refresh(name)
+        if not changes:
+            return
+        status_index = self._status_index.get(name)
+        for record_id, old_status, new_status, added in changes:
+            if status_index is not None:
+                if not added:
+                    status_index.get(old_status, {}).pop(record_id, None)
+                status_index.setdefault(new_status, {})[record_id] = None
+            events.append(ChangeEvent(
+                name, record_id, "added" if added else "updated", old_status, new_status
+            ))
+        # Rebuilt from the records when next needed
+        self._owner_index.pop(name, None)
+
+    def _merge_entry(self, entry, events, dirty):
+        """Apply a change made elsewhere if it is newer than our record"""
+        name = entry["collection"]
+        collection = self._collections.get(name)
+        if collection is None:
+            # Not loaded yet, it will be read in full when it is
+            return
+        record_id = entry["id"]
+        current = collection.get(record_id)
+        if entry["op"] == "put":
+            version = entry["record"].get("_version", 0)
+        else:
+            version = entry["fields"].get("_version", 0)
+            if current is None:
+                return
+        if current is not None and current.get("_version", 0) >= version:
+            return
+
+        old_status = current.get("status") if current is not None else None
+        self._apply_entry(entry)
+        if dirty:
+            self._mark_dirty(name, record_id)
+        events.append(ChangeEvent(
+            name, record_id, "added" if current is None else "updated",
+            old_status, collection[record_id].get("status")
+        ))
+
+    def _write_pending(self):
+        with self._exclusive():
+            if self._file_lock:
+                self._sync()
+            self._write_pending_locked()
+
+    def _write_pending_locked(self):
+        with self._write_lock:
+            if self._transaction is not None:
+                # Only reachable from inside the transaction's own thread;
+                # its changes are written when it ends
+                return
+            with self._lock:
+                if self._commit_timer:
+                    self._commit_timer.cancel()
+                    self._commit_timer = None
+
+                if self.journal:
+                    entries, self._pending_entries = self._pending_entries, []
+                    # Encode now, a record may change again before the append
+                    lines = self.journal.encode(entries)
+                else:
+                    batch = self._take_dirty()
+
+            if not self.journal:
+                self._write_batch(batch)
+                return
+
+            if lines:
+                self.journal.write(lines)
+                if self._file_lock:
+                    # Everything up to here has been synced or is ours
+                    self._journal_position = self.journal.position()
+
+        if self.journal.needs_compaction():
+            self.compact(background=True)
+
+    def _apply_entry(self, entry):
+        """Apply a journal entry to the in-memory collections"""
+        name = entry["collection"]
+        record_id = entry["id"]
+
+        if entry["op"] == "put":
+            self._store_record(name, record_id, entry["record"])
+        elif entry["op"] == "update" and record_id in getattr(self, name):
+            self._set_fields(name, record_id, entry["fields"])
+
+    def _store_record(self, name, record_id, record):
+        """Insert or replace a record, keeping the indexes current"""
+        collection = getattr(self, name)
+        self._preserve(name, collection, record_id)
+        self._pin(name, record_id)
+        if record_id in collection:
+            self._unindex_record(name, record_id, collection[record_id])
+        record = collection[record_id] = make_record(name, record)
+        self._index_record(name, record_id, record)
+
+    def _set_fields(self, name, record_id, fields):
+        """Update fields of a record, keeping the indexes current"""
+        collection = getattr(self, name)
+        self._preserve(name, collection, record_id)
+        self._pin(name, record_id)
+        record = collection[record_id]
+        self._unindex_record(name, record_id, record)
+        record.update(fields)
+        self._index_record(name, record_id, record)
+
+    def _pin(self, name, record_id):
+        # Changes of a transaction are only marked dirty when it commits;
+        # until then the segments holding them must stay in memory
+        if self._transaction is not None:
+            self._pinned[name].add(record_id)
+
+    def compact(self, background=False):
+        """Fold the journal into the collection files"""
+        if not self.journal:
+            return
+
+        if background:
+            if self._compactor and self._compactor.is_alive():
+                return
+            self._compactor = threading.Thread(target=self._compact, daemon=True)
+            self._compactor.start()
+        else:
+            self._compact()
+
+    def _compact(self):
+        try:
+            with self._exclusive():
+                if self._file_lock:
+                    self._sync()
+                # Collections not loaded yet may still have entries in the
+                # journal; loading replays them so they are written out
+                for name in COLLECTIONS:
+                    self._collection(name)
+
+                with self._write_lock:
+                    with self._lock:
+                        # Entries appended from here on go to a fresh log
+                        self.journal.rotate()
+                        batch = self._take_dirty()
+
+                    self._write_batch(batch)
+                    self.journal.finish_compaction()
+                    self._journal_position = self.journal.position()
         except Exception as e:
-            print(f"Error loading bills: {str(e)}")
-            self.bills = {}
+            print(f"Error compacting journal: {str(e)}")
 
-    def save_data(self):
-        # Create data directory if it doesn't exist
-        if not os.path.exists("data"):
-            os.makedirs("data")
-            
-        # Save sessions
-        with open("data/sessions.json", "w") as f:
-            json.dump(self.sessions, f, cls=DateTimeEncoder)
-            
-        # Save motions
-        with open("data/motions.json", "w") as f:
-            json.dump(self.motions, f, cls=DateTimeEncoder)
-            
-        # Save votes
-        with open("data/votes.json", "w") as f:
-            json.dump(self.votes, f, cls=DateTimeEncoder)
-            
-        # Save bills
-        with open("data/bills.json", "w") as f:
-            json.dump(self.bills, f, cls=DateTimeEncoder)
-            
     def add_session(self, session_data):
-        session_id = str(datetime.now().timestamp())
-        self.sessions[session_id] = session_data
-        self.save_data()
+        stamp = datetime.now().timestamp()
+        # Sessions added in quick succession (add_many) can share a timestamp
+        while str(stamp) in self.sessions:
+            stamp += 0.000001
+        session_id = str(stamp)
+        self._put("sessions", session_id, session_data)
         return session_id
-        
-    def get_upcoming_sessions(self, limit=5):
-        # Sort sessions by date and return the next 'limit' sessions
-        sorted_sessions = sorted(
-            [
-                {**session, "id": id} 
-                for id, session in self.sessions.items()
-            ],
-            key=lambda x: datetime.strptime(f"{x['date']} {x['time']}", "%Y-%m-%d %H:%M")
-        )
-        return sorted_sessions[:limit]
-        
+
+    def get_upcoming_sessions(self, limit=5, since=None):
+        """Next 'limit' sessions starting at or after 'since' (default: now)"""
+        sessions = self.sessions
+        position = bisect_left(self._session_times, since or datetime.now())
+        session_ids = self._session_ids[position:position + limit]
+        return [self._session_copy(sessions, id) for id in session_ids]
+
+    def get_sessions_between(self, start, end):
+        """Sessions starting between 'start' and 'end', inclusive, in order"""
+        if self._from_store("sessions"):
+            # Read through the database's date index instead of loading every session
+            rows = self.store.query(
+                "sessions", start=start.strftime("%Y-%m-%d %H:%M"), end=end.strftime("%Y-%m-%d %H:%M")
+            )
+            sessions = []
+            for session_id, session in rows.items():
+                session = make_record("sessions", session)
+                session_start = self._session_start(session)
+                if session_start and start <= session_start <= end:
+                    sessions.append({**session, "id": session_id, "start": session_start})
+            return sessions
+        sessions = self.sessions
+        first = bisect_left(self._session_times, start)
+        last = bisect_right(self._session_times, end)
+        return [self._session_copy(sessions, id) for id in self._session_ids[first:last]]
+
+    def get_sessions(self):
+        """All sessions in chronological order"""
+        sessions = self.sessions
+        return [self._session_copy(sessions, id) for id in self._session_ids]
+
+    def _session_copy(self, sessions, session_id):
+        # "start" is the already parsed date and time, so views don't
+        # have to strptime them again
+        session = sessions[session_id]
+        return {**session, "id": session_id, "start": self._session_start(session)}
+
     def get_calendar_events(self, year, month):
         # Return all events for the specified month
+        sessions = self.sessions
         events = []
-        for id, session in self.sessions.items():
-            date = datetime.strptime(session["date"], "%Y-%m-%d")
-            if date.year == year and date.month == month:
-                events.append({
-                    "id": id,
-                    "title": session["title"],
-                    "date": session["date"],
-                    "time": session["time"],
-                    "type": session["type"]
-                })
-        return events 
-        
-    def add_motion(self, motion_data):
-        self.motions[motion_data["id"]] = motion_data
-        self.save_data()
-        
-    def get_motions(self, include_pending=True):
-        motions = []
-        for id, motion in self.motions.items():
-            if not include_pending and motion["status"] == "Pending":
-                continue
-            motions.append({**motion, "id": id})
-        return motions
-        
-    def approve_motion(self, motion_id, approved=True):
+        for id in self._month_index.get((year, month), ()):
+            session = sessions[id]
+            events.append({
+                "id": id,
+                "title": session["title"],
+                "date": session["date"],
+                "time": session["time"],
+                "type": session["type"],
+                "start": self._session_start(session)
+            })
+        return events
+
+    def get_calendar_events_range(self, year, month, months=1):
+        """Events for 'months' consecutive months starting at year/month.
+
+        Returns a dict keyed by (year, month), so a calendar can fetch the
+        neighbours of the month on screen in the same call.
+        """
+        events = {}
+        for offset in range(months):
+            index = year * 12 + (month - 1) + offset
+            key = (index // 12, index % 12 + 1)
+            events[key] = self.get_calendar_events(*key)
+        return events
+
+    def add_motion(self, motion_data, expected_version=None):
+        self._put("motions", motion_data["id"], motion_data, expected_version)
+
+    def get_motions(self, include_pending=True, status=None):
+        return self._select("motions", status, exclude=None if include_pending else "Pending")
+
+    def approve_motion(self, motion_id, approved=True, expected_version=None):
         if motion_id in self.motions:
-            self.motions[motion_id]["status"] = "Approved" if approved else "Rejected"
-            self.motions[motion_id]["needs_approval"] = False
-            self.save_data() 
-        
-    def add_vote(self, vote_data):
-        self.votes[vote_data["id"]] = vote_data
-        self.save_data()
-        
-    def get_votes(self, include_pending=True):
-        votes = []
-        for id, vote in self.votes.items():
-            if not include_pending and vote["status"] == "Pending":
-                continue
-            votes.append({**vote, "id": id})
-        return votes
-        
-    def approve_vote(self, vote_id, approved=True):
+            self._update("motions", motion_id, {
+                "status": "Approved" if approved else "Rejected",
+                "needs_approval": False
+            }, expected_version)
+
+    def add_vote(self, vote_data, expected_version=None):
+        self._put("votes", vote_data["id"], vote_data, expected_version)
+
+    def get_votes(self, include_pending=True, status=None):
+        return self._select("votes", status, exclude=None if include_pending else "Pending")
+
+    def approve_vote(self, vote_id, approved=True, expected_version=None):
         if vote_id in self.votes:
-            self.votes[vote_id]["status"] = "Approved" if approved else "Rejected"
-            self.votes[vote_id]["needs_approval"] = False
-            self.save_data() 
-        
-    def add_bill(self, bill_data):
+            self._update("votes", vote_id, {
+                "status": "Approved" if approved else "Rejected",
+                "needs_approval": False
+            }, expected_version)
+
+    def add_bill(self, bill_data, expected_version=None):
         """Add a new bill to storage"""
-        self.bills[bill_data["id"]] = bill_data
-        self.save_data()
-        
-    def get_bills(self, include_drafts=True):
+        self._put("bills", bill_data["id"], bill_data, expected_version)
+
+    def get_bills(self, include_drafts=True, status=None):
         """Get list of bills"""
-        bills = []
-        for id, bill in self.bills.items():
-            if not include_drafts and bill["status"] == "Draft":
-                continue
-            bills.append({**bill, "id": id})
-        return bills
-        
-    def approve_bill(self, bill_id, approved=True):
+        return self._select("bills", status, exclude=None if include_drafts else "Draft")
+
+    def approve_bill(self, bill_id, approved=True, expected_version=None):
         """Approve or reject a bill"""
         if bill_id in self.bills:
-            self.bills[bill_id]["status"] = "Passed" if approved else "Rejected"
-            self.bills[bill_id]["needs_approval"] = False
-            self.save_data() 
\ No newline at end of file
+            self._update("bills", bill_id, {
+                "status": "Passed" if approved else "Rejected",
+                "needs_approval": False
+            }, expected_version)
+
+    def version(self, name, record_id):
+        """Current version of a record, 0 if it doesn't exist.
+
+        Pass it back as expected_version to make a change only if nobody
+        else changed the record in between.
+        """
+        record = getattr(self, name).get(record_id)
+        return record.get("_version", 0) if record is not None else 0
+
+    def _check_version(self, name, record_id, record, expected_version):
+        actual = record.get("_version", 0) if record is not None else 0
+        if expected_version is not None and actual != expected_version:
+            raise ConcurrentModificationError(name, record_id, expected_version, actual)
+        return actual
+
+    def _put(self, name, record_id, record, expected_version=None):
+        """Insert or replace a record and persist the change"""
+        with self._transaction_lock, self._exclusive():
+            if self._file_lock:
+                self._sync()
+            with self._lock:
+                old = getattr(self, name).get(record_id)
+                previous = dict(old) if old is not None else None
+                record["_version"] = self._check_version(name, record_id, old, expected_version) + 1
+                self._store_record(name, record_id, record)
+            self._record_change(
+                {"op": "put", "collection": name, "id": record_id, "record": record},
+                previous,
+                ChangeEvent(
+                    name, record_id, "added" if old is None else "updated",
+                    old.get("status") if old else None, record.get("status")
+                )
+            )
+
+    def _update(self, name, record_id, fields, expected_version=None):
+        """Set fields on an existing record and persist the change"""
+        with self._transaction_lock, self._exclusive():
+            if self._file_lock:
+                self._sync()
+            with self._lock:
+                record = getattr(self, name)[record_id]
+                previous = dict(record)
+                old_status = record.get("status")
+                version = self._check_version(name, record_id, record, expected_version)
+                fields = {**fields, "_version": version + 1}
+                self._set_fields(name, record_id, fields)
+            self._record_change(
+                {"op": "update", "collection": name, "id": record_id, "fields": fields},
+                previous,
+                ChangeEvent(name, record_id, "updated", old_status, fields.get("status", old_status))
+            )
+
+    def _record_change(self, entry, previous, event):
+        if self._transaction is not None:
+            # Kept back until the transaction ends; previous is for rollback
+            self._transaction.append((entry, previous, event))
+            return
+        self._commit(entry)
+        self.events.publish(event)
+
+    @contextmanager
+    def transaction(self):
+        """Group mutations so they are applied all together or not at all.
+
+            with data_manager.transaction():
+                data_manager.add_bill(...)
+                data_manager.approve_motion(...)
+
+        Changes are visible to reads inside the block, are written with a
+        single flush (one journal entry) when it ends, and are undone if
+        it raises. Change events are delivered once the block commits.
+        Nested transactions join the outer one; changes from other threads
+        wait until the block has ended.
+        """
+        if self._transaction is not None:
+            yield self
+            return
+
+        with self._transaction_lock, self._exclusive(), self._write_lock:
+            self._transaction = []
+            try:
+                yield self
+            except BaseException:
+                with self._lock:
+                    changes, self._transaction = self._transaction, None
+                    self._rollback(changes)
+                    self._unpin()
+                raise
+            changes, self._transaction = self._transaction, None
+            if changes:
+                self._commit_many([entry for entry, _, _ in changes])
+            with self._lock:
+                self._unpin()
+
+        self.events.hold()
+        for _, _, event in changes:
+            self.events.publish(event)
+        self.events.release()
+
+    def _unpin(self):
+        # Committed changes are dirty now, rolled back ones match the disk
+        for pinned in self._pinned.values():
+            pinned.clear()
+
+    def _rollback(self, changes):
+        for entry, previous, _ in reversed(changes):
+            name = entry["collection"]
+            if previous is None:
+                collection = getattr(self, name)
+                self._preserve(name, collection, entry["id"])
+                self._unindex_record(name, entry["id"], collection.pop(entry["id"]))
+            else:
+                self._store_record(name, entry["id"], previous)
+
+    def read_view(self):
+        """A ReadView of the collections as they are now.
+
+        Close it when done (or use it as a context manager); while open,
+        each change to a record first saves the old record for it.
+
+            with data_manager.read_view() as view:
+                for bill in view.records("bills"):
+                    ...
+        """
+        with self._lock:
+            collections = {name: self._collection(name) for name in COLLECTIONS}
+            view = ReadView(self, collections, encoder=DateTimeEncoder)
+            self._views.append(view)
+        return view
+
+    def _close_view(self, view):
+        with self._lock:
+            if view in self._views:
+                self._views.remove(view)
+
+    def _preserve(self, name, collection, record_id):
+        # Called with the lock held, before the record changes
+        for view in self._views:
+            view.preserve(name, collection, record_id)
+
+    def backup(self, path):
+        """Write a consistent copy of the data directory to path.
+
+        Safe to call from a worker thread; changes made meanwhile are not
+        held up and don't end up in the backup.
+        """
+        with self.read_view() as view:
+            view.backup(path)
+
+    def add_many(self, name, records):
+        """Add several records in one transaction, returns their IDs"""
+        record_ids = []
+        with self.transaction():
+            for record in records:
+                if name == "sessions":
+                    record_ids.append(self.add_session(record))
+                else:
+                    self._put(name, record["id"], record)
+                    record_ids.append(record["id"])
+        return record_ids
+
+    def approve_many(self, name, record_ids, approved=True, expected_versions=None):
+        """Approve or reject several records in one transaction.
+
+        expected_versions optionally maps record IDs to the versions the
+        decisions were based on, see version().
+        """
+        approve = {
+            "motions": self.approve_motion,
+            "votes": self.approve_vote,
+            "bills": self.approve_bill
+        }[name]
+        expected_versions = expected_versions or {}
+        with self.transaction():
+            for record_id in record_ids:
+                approve(record_id, approved, expected_versions.get(record_id))
+
+    def subscribe(self, callback, collection=None):
+        """Have callback(events) called with lists of ChangeEvents.
+
+        Pass collection to only hear about one collection. Events are
+        delivered through events.scheduler when one is set (main.py uses
+        the window's after_idle), so bursts of changes arrive together.
+        """
+        return self.events.subscribe(callback, collection)
+
+    def unsubscribe(self, callback):
+        self.events.unsubscribe(callback)
+
+    def _select(self, name, status=None, exclude=None):
+        """Copies of the records in a collection, filtered by status.
+
+        Status filters are answered from the status index, so the cost is
+        proportional to the number of matching records.
+        """
+        if (status is not None or exclude is not None) and self._from_store(name):
+            records = self.store.query(name, status=status, exclude=exclude)
+            return [{**make_record(name, record), "id": record_id}
+                    for record_id, record in records.items()]
+        collection = getattr(self, name)
+        record_ids = self._select_ids(name, status, exclude)
+        return [{**collection[record_id], "id": record_id} for record_id in record_ids]
+
+    def _select_ids(self, name, status=None, exclude=None):
+        collection = getattr(self, name)
+        index = self._status_index.get(name)
+
+        if index is None or (status is None and exclude is None):
+            return iter(collection)
+        if status is not None:
+            return iter(index.get(status, ()))
+        return chain.from_iterable(
+            ids for record_status, ids in index.items() if record_status != exclude
+        )
+
+    def iter_records(self, name, status=None, exclude=None, offset=0, limit=None,
+                     sort_key=None, reverse=False, fields=None):
+        """Yield read-only RecordViews of a collection, one page at a time.
+
+        sort_key is a field name or a function of the record. Without it,
+        records come in index order and only the requested page is touched.
+        fields limits the keys visible through each view.
+        """
+        collection = getattr(self, name)
+        stop = offset + limit if limit is not None else None
+
+        # The page's IDs are copied out under the lock, so records can be
+        # changed (e.g. approved) while the caller goes through them
+        with self._lock:
+            record_ids = self._select_ids(name, status, exclude)
+            if sort_key is not None:
+                if isinstance(sort_key, str):
+                    field = sort_key
+                    sort_key = lambda record: record.get(field)
+                # Records missing the field sort last, in either direction
+                values = {record_id: sort_key(collection[record_id]) for record_id in record_ids}
+                record_ids = sorted(
+                    (record_id for record_id, value in values.items() if value is not None),
+                    key=values.__getitem__,
+                    reverse=reverse
+                )
+                record_ids.extend(record_id for record_id, value in values.items() if value is None)
+            page = list(islice(record_ids, offset, stop))
+
+        fields = frozenset(fields) if fields is not None else None
+        for record_id in page:
+            record = collection.get(record_id)
+            if record is not None:
+                yield RecordView(record_id, record, fields)
+
+    def query(self, name):
+        """A Query over a collection, answered from the best index.
+
+        For example, the newest ten drafts of a member:
+
+            data_manager.query("bills").where(status="Draft", created_by=user)
+                .order_by("date", reverse=True).limit(10).all()
+
+        Results are copies with "id" set, as from get_bills(); sessions
+        also get "start". explain() tells which index was used.
+        """
+        return Query(CollectionSource(self, name))
+
+    def _access_paths(self, name, conditions):
+        """Indexes that can narrow a query on a collection down"""
+        paths = []
+        status_index = self._status_index.get(name)
+        first, last = 0, len(self._session_ids)
+        ranged = False
+
+        for field, op, value in conditions:
+            if field == "status" and status_index is not None:
+                if op == "eq":
+                    groups = [status_index.get(value, {})]
+                elif op == "in":
+                    groups = [status_index.get(status, {}) for status in set(value)]
+                elif op == "ne":
+                    groups = [ids for status, ids in status_index.items() if status != value]
+                else:
+                    continue
+                paths.append(_id_path("status index", list(chain.from_iterable(groups))))
+            elif field == "created_by" and op == "eq" and name in OWNER_INDEXED:
+                key = _owner_key(value)
+                if not isinstance(key, Hashable):
+                    continue
+                # Every record the condition can match is under key; the
+                # condition itself is still checked against each of them
+                ids = self._owners(name).get(key, {})
+                paths.append(_id_path("owner index", list(ids)))
+            elif field == "start" and name == "sessions" and op in ("eq", "gt", "gte", "lt", "lte"):
+                ranged = True
+                if op in ("eq", "gte"):
+                    first = max(first, bisect_left(self._session_times, value))
+                elif op == "gt":
+                    first = max(first, bisect_right(self._session_times, value))
+                if op in ("eq", "lte"):
+                    last = min(last, bisect_right(self._session_times, value))
+                elif op == "lt":
+                    last = min(last, bisect_left(self._session_times, value))
+
+        if name == "sessions" and (ranged or len(self._session_ids) == len(self.sessions)):
+            # Without a range, only usable when every session has a start
+            ids = self._session_ids[first:last] if first < last else []
+            paths.append(_id_path("date index", ids, order="start"))
+        return paths
+
+    def _owners(self, name):
+        owners = self._owner_index.get(name)
+        if owners is None:
+            with self._lock:
+                owners = self._owner_index.get(name)
+                if owners is None:
+                    owners = {}
+                    for record_id, record in getattr(self, name).items():
+                        owners.setdefault(_owner_key(record.get("created_by")), {})[record_id] = None
+                    # Kept current by _index_record() from now on
+                    self._owner_index[name] = owners
+        return owners
+
+    def _from_store(self, name):
+        """Whether reads of a collection can go straight to the storage
+        engine's indexes (SQLite). Only until the collection is loaded, and
+        only without a journal, so the store holds every change"""
+        return (hasattr(self.store, "query") and not self.journal
+                and name not in self._collections)
+
+    def count(self, name, status=None, exclude=None):
+        """Number of records in a collection, answered from the indexes"""
+        if self._from_store(name):
+            return self.store.count(name, status, exclude)
+        collection = getattr(self, name)
+        index = self._status_index.get(name)
+
+        if index is None or (status is None and exclude is None):
+            return len(collection)
+        if status is not None:
+            return len(index.get(status, ()))
+        return sum(len(ids) for record_status, ids in index.items() if record_status != exclude)
+
+    def status_counts(self, name):
+        """status -> number of records, for a status indexed collection"""
+        if self._from_store(name):
+            return self.store.status_counts(name)
+        getattr(self, name)  # loads the collection and its index
+        return {status: len(ids) for status, ids in self._status_index[name].items() if ids}
+
+    def get_users(self):
+        """The user accounts from data/users.json"""
+        if self._users is None:
+            with self._lock:
+                if self._users is None:
+                    try:
+                        with open(os.path.join("data", "users.json"), "r") as f:
+                            users = json.load(f)
+                    except (OSError, ValueError):
+                        users = []
+                    self._active_members = sum(1 for user in users if _is_active_member(user))
+                    self._users = users
+        return self._users
+
+    def save_users(self, users):
+        """Write the user accounts back to data/users.json"""
+        with self._exclusive():
+            with self._lock:
+                self._users = users
+                self._active_members = sum(1 for user in users if _is_active_member(user))
+            self._files.write_file(os.path.join("data", "users.json"), json.dumps(users, indent=4))
+        self.events.publish(ChangeEvent("users", None, "updated", None, None))
+
+    def active_member_count(self):
+        self.get_users()
+        return self._active_members
+
+    def get_attendance(self, session_id):
+        """username -> {"status", "time"} recorded for a session"""
+        with self._lock:
+            return self.attendance.session(session_id)
+
+    def record_attendance(self, session_id, statuses):
+        """Record {username: status} for a session, keeping earlier entries"""
+        with self._exclusive():
+            with self._lock:
+                if self.attendance.refresh():
+                    self._rollups = None
+                changes = self.attendance.record(
+                    session_id, statuses, datetime.now().strftime("%Y-%m-%d %H:%M")
+                )
+                session = self.sessions.get(session_id)
+                start = self._session_start(session) if session is not None else None
+                if self._rollups is not None and start:
+                    for username, old, new in changes:
+                        self._rollups.change(start, username, old, new)
+        self.events.publish(ChangeEvent("attendance", session_id, "updated", None, None))
+
+    def attendance_counts(self, session_id):
+        """status -> number of members recorded with it for a session"""
+        with self._lock:
+            return self.attendance.session_counts(session_id)
+
+    def attendance_columns(self, session_ids):
+        """(usernames, [status codes per member or None]) for each session,
+        the raw attendance matrix for analytics.py"""
+        with self._lock:
+            return self.attendance.raw_columns(session_ids)
+
+    def attendance_times(self, session_id):
+        """username -> "YYYY-MM-DD HH:MM" each member was recorded at a session"""
+        with self._lock:
+            return self.attendance.times(session_id)
+
+    def member_attendance(self, username, session_ids):
+        """A member's status at each of session_ids, None where not recorded"""
+        with self._lock:
+            return self.attendance.member_statuses(username, session_ids)
+
+    def attendance_summary(self, start=None, end=None):
+        """Attendance totals per member for the sessions held from start to
+        end (dates, inclusive; None for no limit).
+
+        Returns (sessions, {username: [present, late, absent, excused]}).
+        Whole years and months come from the rollups, only the sessions in
+        partial months at either edge of the range are looked at.
+        """
+        with self._lock:
+            self.sessions  # loads the session index
+            rollups = self._attendance_rollups()
+            totals = {}
+            held = 0
+
+            def add(sessions, counts):
+                nonlocal held
+                held += sessions
+                for username, member in counts.items():
+                    total = totals.get(username)
+                    if total is None:
+                        total = totals[username] = [0, 0, 0, 0]
+                    for slot, count in enumerate(member):
+                        total[slot] += count
+
+            if start is None and end is None:
+                for year in rollups.years():
+                    add(*rollups.period((year,)))
+                return held, totals
+            if not self._session_times:
+                return held, totals
+
+            cursor = start or self._session_times[0].date()
+            end = end or self._session_times[-1].date()
+            while cursor <= end:
+                next_month = (cursor.replace(day=28) + timedelta(days=4)).replace(day=1)
+                if cursor.day != 1 or next_month - timedelta(days=1) > end:
+                    # Partial month at an edge of the range
+                    stop = min(next_month - timedelta(days=1), end)
+                    first = bisect_left(self._session_times, datetime.combine(cursor, datetime.min.time()))
+                    last = bisect_left(
+                        self._session_times,
+                        datetime.combine(stop + timedelta(days=1), datetime.min.time())
+                    )
+                    for session_id in self._session_ids[first:last]:
+                        held += 1
+                        for username, code in self.attendance.column(session_id):
+                            total = totals.get(username)
+                            if total is None:
+                                total = totals[username] = [0, 0, 0, 0]
+                            total[SLOTS[code]] += 1
+                    cursor = stop + timedelta(days=1)
+                elif cursor.month == 1 and date(cursor.year, 12, 31) <= end:
+                    add(*(rollups.period((cursor.year,)) or (0, {})))
+                    cursor = date(cursor.year + 1, 1, 1)
+                else:
+                    add(*(rollups.period((cursor.year, cursor.month)) or (0, {})))
+                    cursor = next_month
+            return held, totals
+
+    def _attendance_rollups(self):
+        # Called with the lock held
+        if self._rollups is None:
+            rollups = AttendanceRollups(self.attendance)
+            for session_id, start in zip(self._session_ids, self._session_times):
+                rollups.add_session(session_id, start)
+            # Kept current by record_attendance() and the session index
+            self._rollups = rollups
+        return self._rollups
+
+    def today_attendance(self, today=None):
+        """Share of active members attending today's sessions, None without any"""
+        today = (today or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+        self.sessions  # loads the session index
+        first = bisect_left(self._session_times, today)
+        last = bisect_left(self._session_times, today + timedelta(days=1))
+        expected = self.active_member_count() * (last - first)
+        if not expected:
+            return None
+        attended = 0
+        for session_id in self._session_ids[first:last]:
+            counts = self.attendance_counts(session_id)
+            attended += sum(counts.get(status, 0) for status in ATTENDED)
+        return min(attended / expected, 1.0)
+
+def _owner_key(created_by):
+    # Motions and votes keep the whole user dict as created_by, bills just
+    # the username; the owner index is keyed by the username either way
+    if isinstance(created_by, dict):
+        return created_by.get("username")
+    return created_by
+
+def _is_active_member(user):
+    # Admins run the system and aren't on the roll, see the attendance reports
+    return user.get("role") != "Admin" and user.get("active", True)
@@ -1,6 +1,8 @@
 import customtkinter as ctk
 from tkinter import messagebox
 from access_control import AccessControl
+from datetime import datetime
+from query import Query
 
 class ScrollableDialog:
     def __init__(self, parent, title, width=600, height=700):
@@ -18,10 +20,41 @@ class ScrollableDialog:
         self.main_frame.pack(fill="both", expand=True, padx=20, pady=20)
 
 class AttendanceDialog(ScrollableDialog):
+    """Roll call for a sitting.
+
+    Every member starts with the default status ("all present, mark the
+    exceptions"), or what was already recorded. The whole roll call is
+    kept in the dialog and saved to the attendance store in one go.
+
+    Keyboard: type to find a member, Up/Down to move, Enter to give the
+    highlighted member the marking status, Ctrl+P/L/A/E to pick the
+    marking status and Ctrl+S to save.
+    """
+    
+    STATUSES = ["Present", "Late", "Absent", "Excused"]
+    STATUS_COLORS = {
+        "Present": ("#059669", "#d1fae5"),
+        "Late": ("#d97706", "#fef3c7"),
+        "Absent": ("#dc2626", "#fee2e2"),
+        "Excused": ("#6b7280", "#f3f4f6")
+    }
+    
     def __init__(self, parent):
         super().__init__(parent, "Manage Attendance", width=800, height=600)
         self.parent = parent
         self.data_manager = parent.data_manager
+        
+        # Members on the roll, admins aren't
+        self.members = sorted(
+            (user for user in self.data_manager.get_users() if user.get("role") != "Admin"),
+            key=lambda user: user["name"].lower()
+        )
+        self.statuses = {}
+        self.rows = {}
+        self.recorded = {}
+        self.visible = []
+        self.highlighted = None
+        
         self.create_dialog_content()
         
     def create_dialog_content(self):
@@ -36,53 +69,274 @@ class AttendanceDialog(ScrollableDialog):
         selector_frame = ctk.CTkFrame(self.main_frame, fg_color="white", corner_radius=15)
         selector_frame.pack(fill="x", pady=(0, 20))
         
-        # Get sessions from data manager
-        sessions = self.data_manager.get_upcoming_sessions()
+        # Get today's and upcoming sessions from data manager
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        sessions = self.data_manager.get_upcoming_sessions(since=today)
         
-        if sessions:
-            # Create session dropdown
-            self.session_var = ctk.StringVar(value=sessions[0]["title"])
-            
+        # Titles can repeat, so the menu shows date and time as well
+        self.sessions = {
+            f"{s['title']} ({s['start'].strftime('%d %b %H:%M')})": s for s in sessions
+        }
+        self.session_var = ctk.StringVar(value=next(iter(self.sessions), ""))
+        
+        if not sessions:
             ctk.CTkLabel(
                 selector_frame,
-                text="Select Session:",
-                font=ctk.CTkFont(size=14, weight="bold")
-            ).pack(side="left", padx=20, pady=15)
-            
-            self.session_menu = ctk.CTkOptionMenu(
-                selector_frame,
-                values=[s["title"] for s in sessions],
-                variable=self.session_var,
+                text="There are no sessions today or coming up",
                 font=ctk.CTkFont(size=14),
-                fg_color="#1a237e",
-                button_color="#283593",
-                button_hover_color="#1e40af",
-                command=self.show_attendance
-            )
-            self.session_menu.pack(side="left", padx=20, pady=15)
+                text_color="gray"
+            ).pack(padx=20, pady=15)
+            return
+            
+        ctk.CTkLabel(
+            selector_frame,
+            text="Select Session:",
+            font=ctk.CTkFont(size=14, weight="bold")
+        ).pack(side="left", padx=20, pady=15)
+        
+        self.session_menu = ctk.CTkOptionMenu(
+            selector_frame,
+            values=list(self.sessions),
+            variable=self.session_var,
+            font=ctk.CTkFont(size=14),
+            fg_color="#1a237e",
+            button_color="#283593",
+            button_hover_color="#1e40af",
+            command=self.show_attendance
+        )
+        self.session_menu.pack(side="left", padx=20, pady=15)
+        
+        # Roll call controls
+        controls = ctk.CTkFrame(self.main_frame, fg_color="white", corner_radius=15)
+        controls.pack(fill="x")
+        
+        ctk.CTkLabel(
+            controls,
+            text="Mark all:",
+            font=ctk.CTkFont(size=12, weight="bold")
+        ).pack(side="left", padx=(20, 5), pady=15)
+        
+        for status in ["Present", "Absent"]:
+            ctk.CTkButton(
+                controls,
+                text=status,
+                font=ctk.CTkFont(size=12),
+                fg_color=self.STATUS_COLORS[status][0],
+                width=80,
+                command=lambda s=status: self.mark_all(s)
+            ).pack(side="left", padx=5)
             
+        ctk.CTkLabel(
+            controls,
+            text="Exceptions:",
+            font=ctk.CTkFont(size=12, weight="bold")
+        ).pack(side="left", padx=(20, 5))
+        
+        self.mark_var = ctk.StringVar(value="Absent")
+        ctk.CTkSegmentedButton(
+            controls,
+            values=self.STATUSES,
+            variable=self.mark_var,
+            font=ctk.CTkFont(size=12)
+        ).pack(side="left", padx=5)
+        
+        ctk.CTkButton(
+            controls,
+            text="Save Roll Call",
+            font=ctk.CTkFont(size=12),
+            fg_color="#1a237e",
+            hover_color="#283593",
+            width=120,
+            command=self.save_roll_call
+        ).pack(side="right", padx=20)
+        
+        # Member search, the keyboard flow starts here
+        self.search_var = ctk.StringVar()
+        self.search_var.trace_add("write", self.filter_members)
+        self.search_entry = ctk.CTkEntry(
+            self.main_frame,
+            textvariable=self.search_var,
+            placeholder_text="Find member (Enter marks, Ctrl+P/L/A/E picks the mark, Ctrl+S saves)",
+            height=35
+        )
+        self.search_entry.pack(fill="x", pady=(20, 0))
+        self.search_entry.bind("<Return>", lambda e: self.mark_highlighted())
+        self.search_entry.bind("<Down>", lambda e: self.move_highlight(1))
+        self.search_entry.bind("<Up>", lambda e: self.move_highlight(-1))
+        for key, status in [("p", "Present"), ("l", "Late"), ("a", "Absent"), ("e", "Excused")]:
+            self.dialog.bind(f"<Control-{key}>", lambda e, s=status: self.mark_var.set(s))
+        self.dialog.bind("<Control-s>", lambda e: self.save_roll_call())
+        
+        # Totals for the roll call so far
+        self.totals_label = ctk.CTkLabel(
+            self.main_frame,
+            text="",
+            font=ctk.CTkFont(size=12),
+            text_color="#64748b"
+        )
+        self.totals_label.pack(anchor="w", pady=(10, 0))
+        
         # Attendance list
         self.attendance_frame = ctk.CTkFrame(self.main_frame, fg_color="white", corner_radius=15)
         self.attendance_frame.pack(fill="both", expand=True, pady=20)
         
         # Show initial attendance list
         self.show_attendance()
+        self.search_entry.focus_set()
+        
+    def current_session(self):
+        return self.sessions.get(self.session_var.get())
         
     def show_attendance(self, *args):
         # Clear current attendance list
         for widget in self.attendance_frame.winfo_children():
             widget.destroy()
+        self.rows = {}
             
         # Create headers
         headers = ctk.CTkFrame(self.attendance_frame, fg_color="transparent")
         headers.pack(fill="x", padx=20, pady=15)
         
-        for header in ["Member", "Status", "Time", "Actions"]:
+        for header in ["Member", "Status", "Time"]:
             ctk.CTkLabel(
                 headers,
                 text=header,
                 font=ctk.CTkFont(size=14, weight="bold")
-            ).pack(side="left", expand=True) 
+            ).pack(side="left", expand=True)
+            
+        # Everyone present unless already recorded otherwise
+        recorded = self.recorded = self.data_manager.get_attendance(self.current_session()["id"])
+        self.statuses = {
+            user["username"]: recorded.get(user["username"], {}).get("status", "Present")
+            for user in self.members
+        }
+        
+        # One row per member, built once and updated in place
+        for user in self.members:
+            row = ctk.CTkFrame(self.attendance_frame, fg_color="transparent", height=32)
+            
+            ctk.CTkLabel(
+                row,
+                text=user["name"],
+                font=ctk.CTkFont(size=12),
+                anchor="w"
+            ).pack(side="left", expand=True, fill="x", padx=20)
+            
+            status_label = ctk.CTkLabel(
+                row,
+                text="",
+                font=ctk.CTkFont(size=12),
+                corner_radius=10,
+                width=80,
+                cursor="hand2"
+            )
+            status_label.pack(side="left", expand=True)
+            # Clicking a status moves it on to the next one
+            status_label.bind("<Button-1>", lambda e, u=user["username"]: self.cycle_status(u))
+            
+            time_text = recorded.get(user["username"], {}).get("time") or "—"
+            # Recorded on the day of the session, the time says enough
+            if time_text.startswith(self.current_session()["date"] + " "):
+                time_text = time_text[11:]
+            ctk.CTkLabel(
+                row,
+                text=time_text,
+                font=ctk.CTkFont(size=12),
+                text_color="#64748b"
+            ).pack(side="left", expand=True)
+            
+            self.rows[user["username"]] = (row, status_label)
+            self.update_row(user["username"])
+            
+        self.filter_members()
+        
+    def update_row(self, username):
+        row, status_label = self.rows[username]
+        status = self.statuses[username]
+        color, bg_color = self.STATUS_COLORS[status]
+        status_label.configure(text=status, text_color=color, fg_color=bg_color)
+        row.configure(fg_color="#e0e7ff" if username == self.highlighted else "transparent")
+        
+    def update_totals(self):
+        counts = {status: 0 for status in self.STATUSES}
+        for status in self.statuses.values():
+            counts[status] += 1
+        self.totals_label.configure(
+            text="   ".join(f"{status}: {count}" for status, count in counts.items())
+        )
+        
+    def set_status(self, username, status):
+        self.statuses[username] = status
+        self.update_row(username)
+        self.update_totals()
+        
+    def cycle_status(self, username):
+        index = self.STATUSES.index(self.statuses[username])
+        self.set_status(username, self.STATUSES[(index + 1) % len(self.STATUSES)])
+        
+    def mark_all(self, status):
+        for username in self.statuses:
+            self.statuses[username] = status
+            self.update_row(username)
+        self.update_totals()
+        
+    def filter_members(self, *args):
+        search = self.search_var.get().strip()
+        matches = Query.over(self.members, "members").search(search, "name", "username").all()
+        self.visible = [user["username"] for user in matches]
+        
+        for row, _ in self.rows.values():
+            row.pack_forget()
+        for username in self.visible:
+            self.rows[username][0].pack(fill="x", padx=5, pady=1)
+            
+        # Highlight the first match while searching
+        self.set_highlight(self.visible[0] if search and self.visible else None)
+        self.update_totals()
+        
+    def set_highlight(self, username):
+        previous, self.highlighted = self.highlighted, username
+        for name in (previous, username):
+            if name in self.rows:
+                self.update_row(name)
+                
+    def move_highlight(self, step):
+        if not self.visible:
+            return
+        if self.highlighted in self.visible:
+            index = (self.visible.index(self.highlighted) + step) % len(self.visible)
+        else:
+            index = 0
+        self.set_highlight(self.visible[index])
+        
+    def mark_highlighted(self):
+        if self.highlighted is None:
+            return
+        self.set_status(self.highlighted, self.mark_var.get())
+        # Ready for the next exception
+        self.search_var.set("")
+        
+    def save_roll_call(self):
+        session = self.current_session()
+        if session is None or not self.statuses:
+            return
+        # Members whose status is unchanged keep their recorded time
+        changed = {
+            username: status for username, status in self.statuses.items()
+            if self.recorded.get(username, {}).get("status") != status
+        }
+        try:
+            # The whole roll call is one write to the attendance store
+            self.data_manager.record_attendance(session["id"], changed)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save attendance: {str(e)}")
+            return
+            
+        messagebox.showinfo(
+            "Success",
+            f"Attendance for {session['title']} saved ({len(self.statuses)} members)"
+        )
+        self.show_attendance()
 
 class AdminAccessControlDialog(ScrollableDialog):
     def __init__(self, parent):
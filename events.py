@@ -0,0 +1,118 @@
+import threading
+
+
+class ChangeEvent:
+    """A change to one record: op is "added" or "updated" """
+
+    __slots__ = ("collection", "id", "op", "old_status", "new_status")
+
+    def __init__(self, collection, id, op, old_status=None, new_status=None):
+        self.collection = collection
+        self.id = id
+        self.op = op
+        self.old_status = old_status
+        self.new_status = new_status
+
+    def __repr__(self):
+        return (f"ChangeEvent({self.collection!r}, {self.id!r}, {self.op!r}, "
+                f"{self.old_status!r} -> {self.new_status!r})")
+
+
+class EventBus:
+    """Delivers DataManager change events to subscribed views.
+
+    Events are queued and delivered in batches: with a scheduler (Tk's
+    after_idle) a burst of mutations reaches subscribers as one list once
+    the UI is idle, and several changes to the same record collapse into
+    one event. Without a scheduler each event is delivered immediately.
+
+    Tk may only be called from its own thread, the one the bus is created
+    on. Events published on other threads (the writer, the compactor)
+    wait in the queue until that thread calls poll().
+    """
+
+    def __init__(self, scheduler=None):
+        self.scheduler = scheduler
+        self.thread = threading.current_thread()
+        self._subscribers = []
+        self._pending = {}
+        self._scheduled = False
+        self._held = 0
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback, collection=None):
+        """Call callback(events) with the changes to collection (or to all)"""
+        with self._lock:
+            self._subscribers.append((callback, collection))
+        return callback
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers = [
+                (subscriber, collection) for subscriber, collection in self._subscribers
+                if subscriber != callback
+            ]
+
+    def publish(self, event):
+        with self._lock:
+            key = (event.collection, event.id)
+            queued = self._pending.get(key)
+            if queued is None:
+                self._pending[key] = event
+            else:
+                # Keep the status the record had before the whole burst
+                queued.new_status = event.new_status
+        self._schedule()
+
+    def hold(self):
+        """Queue events without delivering them until release()"""
+        with self._lock:
+            self._held += 1
+
+    def release(self):
+        with self._lock:
+            self._held -= 1
+        self._schedule()
+
+    def poll(self):
+        """Deliver events published on other threads, from self.thread"""
+        self._schedule()
+
+    def _schedule(self):
+        with self._lock:
+            if self._held or self._scheduled or not self._pending:
+                return
+            if self.scheduler and threading.current_thread() is not self.thread:
+                # Left for poll(), calling the scheduler here could block
+                # on the Tk thread while it waits for us
+                return
+            if self.scheduler:
+                self._scheduled = True
+                scheduler = self.scheduler
+            else:
+                scheduler = None
+
+        if scheduler:
+            scheduler(self.dispatch)
+        else:
+            self.dispatch()
+
+    def dispatch(self):
+        """Deliver the queued events"""
+        with self._lock:
+            events = list(self._pending.values())
+            self._pending = {}
+            self._scheduled = False
+            subscribers = list(self._subscribers)
+
+        if not events:
+            return
+        for callback, collection in subscribers:
+            matching = [event for event in events
+                        if collection is None or event.collection == collection]
+            if not matching:
+                continue
+            try:
+                callback(matching)
+            except Exception as e:
+                print(f"Error delivering change events: {str(e)}")
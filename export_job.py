@@ -0,0 +1,67 @@
+import csv
+import os
+import threading
+from itertools import islice
+
+
+class ExportJob:
+    """Write CSV rows to a file in a worker thread.
+
+    rows can be any iterable and is consumed while the file is written, so
+    memory stays flat however many rows there are. Rows are written in
+    chunks to a temporary file that only replaces path once complete;
+    cancel() stops the job before the next chunk and leaves path as it
+    was. The Tk thread polls progress and is_alive() to follow the job.
+    """
+
+    def __init__(self, path, header, rows, total=None, chunk_size=200):
+        self.path = path
+        self.header = header
+        self.rows = rows
+        self.total = total
+        self.chunk_size = chunk_size
+        self.written = 0
+        self.error = None
+        self.cancelled = False
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    @property
+    def progress(self):
+        """Fraction of the rows written, None when the total is unknown"""
+        if not self.total:
+            return None
+        return min(self.written / self.total, 1.0)
+
+    def _run(self):
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(self.header)
+                rows = iter(self.rows)
+                while not self._cancel.is_set():
+                    chunk = list(islice(rows, self.chunk_size))
+                    if not chunk:
+                        break
+                    writer.writerows(chunk)
+                    self.written += len(chunk)
+
+            if self._cancel.is_set():
+                self.cancelled = True
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, self.path)
+        except Exception as e:
+            self.error = e
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
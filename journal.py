@@ -0,0 +1,119 @@
+import json
+import os
+
+
+class Journal:
+    """Append-only log of DataManager mutations.
+
+    Each mutation is written as one JSON line. Entries are idempotent
+    (a "put" stores a whole record, an "update" sets fields), so replaying
+    an entry that is already reflected in the snapshot files is harmless.
+    A "batch" entry holds the entries of one transaction on a single line,
+    so a torn write loses the whole transaction rather than part of it.
+    """
+
+    def __init__(self, path, encoder=None, compact_threshold=1024 * 1024):
+        self.path = path
+        self.compacting_path = path + ".compacting"
+        self.encoder = encoder
+        self.compact_threshold = compact_threshold
+
+    def encode(self, entries):
+        return "".join(
+            json.dumps(entry, cls=self.encoder, separators=(",", ":")) + "\n"
+            for entry in entries
+        )
+
+    def write(self, lines):
+        # One write and one fsync for the whole batch
+        with open(self.path, "a") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def replay(self):
+        # An interrupted compaction leaves its rotated log behind; it holds
+        # older entries than the live log, so it is replayed first
+        for path in (self.compacting_path, self.path):
+            if not os.path.exists(path):
+                continue
+            with open(path, "r") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A torn write at the tail of the log, skip it
+                        print(f"Skipping corrupt journal entry in {path}")
+                        continue
+                    yield from self._expand(entry)
+
+    def position(self):
+        """(inode, size) of the live log, where read_since() picks up from"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return (None, 0)
+        return (stat.st_ino, stat.st_size)
+
+    def read_since(self, position):
+        """Entries appended after position by any process.
+
+        Returns (entries, new position, rotated). rotated is True when the
+        log was compacted away since position; the entries then start at
+        the beginning of the fresh log.
+        """
+        inode, offset = position
+        current_inode, size = self.position()
+        rotated = inode is not None and (current_inode != inode or size < offset)
+        if rotated or current_inode is None:
+            offset = 0
+        if current_inode is None or size == offset:
+            return [], (current_inode, offset), rotated
+
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            data = f.read(size - offset)
+        # A line still being written is left for the next call
+        data = data[:data.rfind(b"\n") + 1]
+
+        entries = []
+        for line in data.decode("utf-8").splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entries.extend(self._expand(json.loads(line)))
+            except ValueError:
+                print(f"Skipping corrupt journal entry in {self.path}")
+        return entries, (current_inode, offset + len(data)), rotated
+
+    def _expand(self, entry):
+        if entry.get("op") == "batch":
+            return entry["entries"]
+        return [entry]
+
+    def size(self):
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def needs_compaction(self):
+        return self.size() >= self.compact_threshold
+
+    def rotate(self):
+        """Move the live log aside so new entries start a fresh file"""
+        if os.path.exists(self.compacting_path):
+            # A previous compaction never finished; its entries are still
+            # covered by the snapshot about to be written, keep appending
+            return
+        if os.path.exists(self.path):
+            os.replace(self.path, self.compacting_path)
+
+    def finish_compaction(self):
+        """Drop the rotated log once the snapshot files are on disk"""
+        if os.path.exists(self.compacting_path):
+            os.remove(self.compacting_path)
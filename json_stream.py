@@ -0,0 +1,109 @@
+import json
+
+# Characters json skips between tokens
+WHITESPACE = " \t\n\r"
+# Characters that can appear in a JSON number
+NUMBER_CHARS = "0123456789+-.eE"
+
+
+def iter_json_object(path, chunk_size=64 * 1024):
+    """Yield the (key, value) pairs of the JSON object stored in path.
+
+    The file is read chunk_size characters at a time and each value is
+    decoded as soon as it is complete, so memory use is bounded by the
+    largest single value rather than by the size of the file. An empty
+    file counts as an empty object.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r") as f:
+        reader = _Reader(f, chunk_size)
+
+        if not reader.skip_whitespace():
+            return
+        reader.expect("{")
+
+        first = True
+        while True:
+            if not reader.skip_whitespace():
+                raise ValueError(f"Unexpected end of {path}")
+            if reader.peek() == "}":
+                return
+            if not first:
+                reader.expect(",")
+                reader.skip_whitespace()
+            first = False
+
+            key = reader.decode(decoder)
+            if not isinstance(key, str):
+                raise ValueError(f"Expected a string key in {path}")
+            reader.skip_whitespace()
+            reader.expect(":")
+            reader.skip_whitespace()
+            yield key, reader.decode(decoder)
+
+
+class _Reader:
+    """Sliding buffer over a text file, refilled as values are consumed"""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+
+    def fill(self):
+        """Read another chunk, dropping what has already been parsed"""
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def skip_whitespace(self):
+        """Move to the next token, returns False at the end of the file"""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return True
+            if not self.fill():
+                return False
+
+    def peek(self):
+        return self.buffer[self.position]
+
+    def expect(self, char):
+        if self.position >= len(self.buffer) and not self.fill():
+            raise ValueError(f"Expected {char!r} but the file ended")
+        if self.buffer[self.position] != char:
+            raise ValueError(
+                f"Expected {char!r} but found {self.buffer[self.position]!r}"
+            )
+        self.position += 1
+
+    def at_edge(self, end):
+        while end < len(self.buffer) and self.buffer[end] in NUMBER_CHARS:
+            end += 1
+        return end == len(self.buffer)
+
+    def decode(self, decoder):
+        """Decode the value at the current position, reading more as needed"""
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                # Most likely the value runs past the end of the buffer
+                if self.fill():
+                    continue
+                raise
+            # A number running up to the buffer edge ("12" of "12.5") may
+            # continue in the next chunk
+            if self.at_edge(end) and self.fill():
+                continue
+            self.position = end
+            return value
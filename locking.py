@@ -0,0 +1,86 @@
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """Advisory lock on a file shared by every workstation using a data directory.
+
+    The lock is reentrant within a process: threads of one process queue on
+    a local lock and only the outermost acquire takes the OS level lock.
+    """
+
+    def __init__(self, path, poll_interval=0.05):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._local = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def acquire(self, blocking=True):
+        """Take the lock, returns False if blocking is False and it is held"""
+        if not self._local.acquire(blocking):
+            return False
+        if self._depth == 0:
+            try:
+                if not self._lock_file(blocking):
+                    self._local.release()
+                    return False
+            except Exception:
+                self._local.release()
+                raise
+        self._depth += 1
+        return True
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            self._unlock_file()
+        self._local.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def _lock_file(self, blocking):
+        if self._file is None:
+            self._file = open(self.path, "a+")
+
+        if fcntl:
+            flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            try:
+                fcntl.flock(self._file.fileno(), flags)
+            except BlockingIOError:
+                return False
+            return True
+
+        # msvcrt locks a byte range and gives up after ten tries, so poll
+        self._file.seek(0)
+        while True:
+            try:
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    return False
+                time.sleep(self.poll_interval)
+
+    def _unlock_file(self):
+        if fcntl:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
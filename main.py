@@ -1,6 +1,8 @@
 import customtkinter as ctk
 import os
 import sys
+import time
+from datetime import datetime
 
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -9,8 +11,16 @@ from login import LoginWindow
 from dashboard import AssemblyDashboard
 from data_manager import DataManager
 
+# How often a shared data directory is checked for other machines' changes
+SYNC_INTERVAL_MS = 5000
+
+# How often change events published off the Tk thread are picked up
+EVENT_POLL_MS = 200
+
 class Application:
     def __init__(self):
+        started = time.perf_counter()
+        
         self.window = ctk.CTk()
         self.window.title("House of Assembly")
         
@@ -37,8 +47,59 @@ class Application:
         self.current_frame = None
         self.show_login()
         
-        # Initialize data manager
-        self.data_manager = DataManager()
+        # Initialize data manager, HOAA_STORAGE_BACKEND=sqlite switches the
+        # storage engine from the JSON files to data/hoaa.db,
+        # HOAA_STORAGE_BACKEND=segmented moves past years of motions, votes
+        # and bills into data/archive, and HOAA_SHARED_DATA=1 is for a data
+        # directory used by several machines
+        backend = os.environ.get("HOAA_STORAGE_BACKEND", "json")
+        shared = os.environ.get("HOAA_SHARED_DATA") == "1"
+        self.data_manager = DataManager(
+            journaled=(backend in ("json", "segmented")),
+            backend=backend,
+            commit_window=0.05,
+            async_writes=True,
+            # Only the JSON files can be checked against a snapshot
+            snapshot_path=os.path.join("data", "snapshot.hoaa") if backend == "json" else None,
+            shared=shared
+        )
+        
+        # Deliver change events to the views once Tk is idle, so a burst of
+        # changes redraws them once
+        self.data_manager.events.scheduler = self.window.after_idle
+        self.window.after(EVENT_POLL_MS, self.poll_events)
+        
+        # Make sure queued writes reach the disk before the window goes away
+        self.window.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # Pick up changes made on the other workstations
+        if shared:
+            self.window.after(SYNC_INTERVAL_MS, self.poll_shared_data)
+        
+        self.log_startup_time(time.perf_counter() - started)
+        
+    def poll_events(self):
+        self.data_manager.events.poll()
+        self.window.after(EVENT_POLL_MS, self.poll_events)
+        
+    def poll_shared_data(self):
+        # Skip this round rather than block the UI while another machine writes
+        self.data_manager.sync(blocking=False)
+        self.window.after(SYNC_INTERVAL_MS, self.poll_shared_data)
+        
+    def log_startup_time(self, seconds):
+        # Recorded in the system log so it shows up under Admin > System Logs
+        try:
+            if not os.path.exists("logs"):
+                os.makedirs("logs")
+            with open(os.path.join("logs", "system.log"), "a") as f:
+                f.write(
+                    f"{datetime.now().isoformat()} | INFO | "
+                    f"Startup completed in {seconds * 1000:.1f} ms "
+                    f"(data manager {self.data_manager.startup_time * 1000:.1f} ms)\n"
+                )
+        except OSError as e:
+            print(f"Error writing startup time: {str(e)}")
         
     def show_login(self):
         if self.current_frame:
@@ -58,6 +119,10 @@ class Application:
     def on_login_success(self, user_data):
         self.show_dashboard(user_data)
     
+    def on_close(self):
+        self.data_manager.close()
+        self.window.destroy()
+    
     def run(self):
         self.window.mainloop()
 
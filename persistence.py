@@ -0,0 +1,91 @@
+import queue
+import threading
+import time
+from collections import deque
+
+
+class PersistenceWorker(threading.Thread):
+    """Writer thread that runs DataManager flushes off the Tk mainloop.
+
+    Mutations only enqueue a flush request. The worker drains every request
+    waiting in the queue and satisfies them all with one flush, so a burst of
+    changes costs a single write.
+    """
+
+    def __init__(self, flush_fn, max_pending=64, window=0.0, history=100):
+        super().__init__(name="PersistenceWorker", daemon=True)
+        self.flush_fn = flush_fn
+        self.window = window
+        self._queue = queue.Queue(maxsize=max_pending)
+
+        # Flush latency, measured from the oldest request in a batch until
+        # its data is on disk
+        self.latencies = deque(maxlen=history)
+        self.flush_count = 0
+        self.error_count = 0
+
+    def request(self):
+        """Ask for a flush without waiting for it"""
+        try:
+            self._queue.put_nowait((time.perf_counter(), None, False))
+        except queue.Full:
+            # Requests already waiting will flush this change as well
+            pass
+
+    def flush(self, timeout=None):
+        """Flush now and wait until it is done, returns False on timeout"""
+        if not self.is_alive():
+            self.flush_fn()
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put((time.perf_counter(), done, False), timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def stop(self, timeout=None):
+        """Flush what is pending and end the thread"""
+        if not self.is_alive():
+            return
+        self._queue.put((time.perf_counter(), None, True), timeout=timeout)
+        self.join(timeout)
+
+    def stats(self):
+        latencies = list(self.latencies)
+        return {
+            "flushes": self.flush_count,
+            "errors": self.error_count,
+            "pending": self._queue.qsize(),
+            "last": latencies[-1] if latencies else None,
+            "average": sum(latencies) / len(latencies) if latencies else None,
+            "max": max(latencies) if latencies else None
+        }
+
+    def run(self):
+        while True:
+            batch = [self._queue.get()]
+
+            # Give closely spaced mutations a moment to join this batch
+            if self.window > 0:
+                time.sleep(self.window)
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self.flush_fn()
+                self.flush_count += 1
+            except Exception as e:
+                self.error_count += 1
+                print(f"Error flushing data: {str(e)}")
+
+            self.latencies.append(time.perf_counter() - min(item[0] for item in batch))
+            for _, done, _ in batch:
+                if done:
+                    done.set()
+
+            if any(stop for _, _, stop in batch):
+                return
@@ -0,0 +1,194 @@
+import time
+from collections import namedtuple
+
+# Condition operators, written as where(field__op=value). A field on its
+# own compares for equality
+OPERATORS = {
+    "eq": lambda value, target: value == target,
+    "ne": lambda value, target: value != target,
+    "lt": lambda value, target: value is not None and value < target,
+    "lte": lambda value, target: value is not None and value <= target,
+    "gt": lambda value, target: value is not None and value > target,
+    "gte": lambda value, target: value is not None and value >= target,
+    "in": lambda value, target: value in target,
+    "contains": lambda value, target: (
+        isinstance(value, str) and target.lower() in value.lower()
+    )
+}
+
+Condition = namedtuple("Condition", "field op value")
+
+
+class AccessPath(namedtuple("AccessPath", "index estimate ids order")):
+    """One way a source can produce the candidate rows of a query.
+
+    index names the index ("full scan" when there is none), estimate is
+    how many rows it yields and ids(reverse) yields their IDs. order is
+    the field the IDs come sorted by, if any, so the query can skip its
+    own sort.
+    """
+
+
+class QueryPlan(namedtuple("QueryPlan", "source index estimate scanned returned ordering seconds")):
+    """What explain() reports about a query. ordering is None, "index"
+    when the index yielded the rows in order or "sort" """
+
+    def __str__(self):
+        order = f", ordered by {self.ordering}" if self.ordering else ""
+        return (
+            f"{self.source}: {self.index}, {self.scanned} of ~{self.estimate} rows scanned, "
+            f"{self.returned} returned{order}, {self.seconds * 1000:.1f} ms"
+        )
+
+
+class ListSource:
+    """A plain list of dicts. It has no indexes, every query scans it"""
+
+    def __init__(self, items, name="list"):
+        self.items = items if isinstance(items, list) else list(items)
+        self.name = name
+
+    def access_paths(self, conditions):
+        return []
+
+    def scan_path(self):
+        return AccessPath("full scan", len(self.items), self._positions, None)
+
+    def _positions(self, reverse=False):
+        if reverse:
+            return range(len(self.items) - 1, -1, -1)
+        return range(len(self.items))
+
+    def get(self, row_id):
+        return self.items[row_id]
+
+    def value(self, item, field):
+        return item.get(field)
+
+    def result(self, row_id, item):
+        return item
+
+
+class Query:
+    """Declarative query over a source: filters, ordering and a limit.
+
+    Built up with where(), search(), order_by() and limit(), run with
+    all() or first(). The source is asked which indexes can answer the
+    conditions and the one yielding the fewest rows is used; every
+    condition is still checked against each row it yields.
+    explain() runs the query and reports how it went.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.conditions = []
+        self.searches = []
+        self.order = None
+        self.reverse = False
+        self.offset = 0
+        self.count = None
+
+    @classmethod
+    def over(cls, items, name="list"):
+        """Query over a list of dicts, e.g. users or log entries"""
+        return cls(ListSource(items, name))
+
+    def where(self, **filters):
+        for key, value in filters.items():
+            field, _, op = key.partition("__")
+            op = op or "eq"
+            if op not in OPERATORS:
+                raise ValueError(f"Unknown query operator: {op}")
+            self.conditions.append(Condition(field, op, value))
+        return self
+
+    def search(self, text, *fields):
+        """Keep rows where any of fields contains text, ignoring case"""
+        if text:
+            self.searches.append((text.lower(), fields))
+        return self
+
+    def order_by(self, field, reverse=False):
+        self.order = field
+        self.reverse = reverse
+        return self
+
+    def limit(self, count, offset=0):
+        self.count = count
+        self.offset = offset
+        return self
+
+    def all(self):
+        return self._run()[0]
+
+    def first(self):
+        results = self._run(count=1)[0]
+        return results[0] if results else None
+
+    def explain(self):
+        return self._run()[1]
+
+    def _plan(self):
+        """The access path yielding the fewest rows"""
+        best = self.source.scan_path()
+        for path in self.source.access_paths(self.conditions):
+            ordered = self.order is not None and path.order == self.order
+            if path.estimate < best.estimate or (
+                path.estimate == best.estimate and ordered and best.order != self.order
+            ):
+                best = path
+        if self.order is not None and best.order != self.order:
+            # An index already in the requested order saves the sort and
+            # can stop at the limit, worth it when nothing is much smaller
+            for path in self.source.access_paths(self.conditions):
+                if path.order == self.order and best.estimate * 2 >= path.estimate:
+                    best = path
+        return best
+
+    def _matches(self, record):
+        value = self.source.value
+        for field, op, target in self.conditions:
+            if not OPERATORS[op](value(record, field), target):
+                return False
+        for text, fields in self.searches:
+            if not any(text in str(value(record, field) or "").lower() for field in fields):
+                return False
+        return True
+
+    def _run(self, count=None):
+        started = time.perf_counter()
+        count = self.count if count is None else count
+        path = self._plan()
+        in_order = self.order is None or path.order == self.order
+
+        scanned = 0
+        matched = []
+        stop = self.offset + count if count is not None and in_order else None
+        get = self.source.get
+        for row_id in path.ids(self.reverse if in_order else False):
+            record = get(row_id)
+            scanned += 1
+            if self._matches(record):
+                matched.append((row_id, record))
+                if stop is not None and len(matched) >= stop:
+                    break
+
+        if not in_order:
+            value = self.source.value
+            field = self.order
+            # Rows missing the field sort last, in either direction
+            present = [row for row in matched if value(row[1], field) is not None]
+            present.sort(key=lambda row: value(row[1], field), reverse=self.reverse)
+            matched = present + [row for row in matched if value(row[1], field) is None]
+
+        end = self.offset + count if count is not None else None
+        results = [self.source.result(row_id, record) for row_id, record in matched[self.offset:end]]
+        if self.order is None:
+            ordering = None
+        else:
+            ordering = "index" if in_order else "sort"
+        plan = QueryPlan(
+            self.source.name, path.index, path.estimate, scanned, len(results),
+            ordering, time.perf_counter() - started
+        )
+        return results, plan
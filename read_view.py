@@ -0,0 +1,132 @@
+import json
+import os
+import shutil
+
+# Files in the data directory a backup doesn't copy: the collections are
+# written from the view instead, and the rest is derived from them. That
+# includes the journal rotated out by a compaction, replaying it over the
+# backed up collections would roll records back
+NOT_BACKED_UP = (
+    "journal.log", "journal.log.compacting", "snapshot.hoaa", "hoaa.db", "hoaa.db-wal",
+    "hoaa.db-shm", ".lock", "archive"
+)
+
+
+class ReadView:
+    """Point-in-time view of the DataManager's collections.
+
+    Opening one copies nothing. Until it is closed, the first change to
+    each record saves the record as it was into the view (copy on write),
+    so a report or backup can go through a consistent state in a worker
+    thread while the live collections keep changing. Records are read
+    under the DataManager's lock one at a time, writers are never held up
+    for longer than a single record copy.
+    """
+
+    def __init__(self, data_manager, collections, encoder=None):
+        self.data_manager = data_manager
+        self.encoder = encoder
+        self._lock = data_manager._lock
+        # The collection objects as of opening. A collection re-read from
+        # disk later is a new object, this one is then left unchanged
+        self._collections = collections
+        # name -> {id: record as it was, None if it didn't exist}
+        self._before = {name: {} for name in collections}
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.data_manager._close_view(self)
+            self._before = {name: {} for name in self._collections}
+
+    def preserve(self, name, collection, record_id):
+        """Called with the lock held before a record of collection changes"""
+        if self._collections.get(name) is not collection:
+            return
+        before = self._before[name]
+        if record_id not in before:
+            record = collection.get(record_id)
+            before[record_id] = dict(record) if record is not None else None
+
+    def _record(self, name, record_id):
+        # Called with the lock held
+        before = self._before[name]
+        if record_id in before:
+            record = before[record_id]
+            return dict(record) if record is not None else None
+        record = self._collections[name].get(record_id)
+        return dict(record) if record is not None else None
+
+    def get(self, name, record_id):
+        """A copy of a record with "id" set, None if it didn't exist"""
+        with self._lock:
+            record = self._record(name, record_id)
+        if record is None:
+            return None
+        record["id"] = record_id
+        return record
+
+    def ids(self, name):
+        with self._lock:
+            before = self._before[name]
+            ids = [record_id for record_id in self._collections[name]
+                   if before.get(record_id, True) is not None]
+            # Records removed since the view was opened
+            ids.extend(record_id for record_id, record in before.items()
+                       if record is not None and record_id not in self._collections[name])
+        return ids
+
+    def records(self, name):
+        """Yield copies of the records of a collection, with "id" set"""
+        for record_id in self.ids(name):
+            record = self.get(name, record_id)
+            if record is not None:
+                yield record
+
+    def count(self, name):
+        return len(self.ids(name))
+
+    def get_sessions(self):
+        """All sessions in chronological order, as DataManager.get_sessions()"""
+        start = self.data_manager._session_start
+        sessions = [{**session, "start": start(session)} for session in self.records("sessions")]
+        # Sessions without a valid date and time aren't in the session index
+        sessions = [session for session in sessions if session["start"]]
+        sessions.sort(key=lambda session: session["start"])
+        return sessions
+
+    def backup(self, path, data_dir="data"):
+        """Write a consistent copy of the data directory to path.
+
+        Collections are written from the view; other files (users,
+        attendance, settings) are copied as they are.
+        """
+        os.makedirs(path, exist_ok=True)
+        if os.path.exists(data_dir):
+            for entry in os.listdir(data_dir):
+                if entry in NOT_BACKED_UP or entry.endswith(".tmp"):
+                    continue
+                if entry in (f"{name}.json" for name in self._collections):
+                    continue
+                source = os.path.join(data_dir, entry)
+                if os.path.isdir(source):
+                    shutil.copytree(source, os.path.join(path, entry))
+                else:
+                    shutil.copy2(source, os.path.join(path, entry))
+
+        for name in self._collections:
+            records = {}
+            for record_id in self.ids(name):
+                with self._lock:
+                    record = self._record(name, record_id)
+                if record is not None:
+                    records[record_id] = record
+            with open(os.path.join(path, f"{name}.json"), "w") as f:
+                json.dump(records, f, cls=self.encoder)
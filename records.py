@@ -0,0 +1,148 @@
+import sys
+from collections.abc import MutableMapping
+from datetime import datetime
+
+# Format motion and bill dates are stored in
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class Record(MutableMapping):
+    """A stored record that behaves like the dict it replaces.
+
+    The fields every record of a kind has are kept in __slots__, which
+    takes a fraction of the memory of a dict; anything else goes into a
+    small overflow dict. Status strings are interned so the many records
+    sharing a status share one string. dict(record) gives the plain dict
+    that is written to disk.
+    """
+
+    __slots__ = ("_extra",)
+    FIELDS = frozenset()
+
+    def __init__(self, data=None):
+        self._extra = None
+        if data:
+            for key, value in data.items():
+                self[key] = value
+
+    def __getitem__(self, key):
+        if key in self.FIELDS:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key, value):
+        if key in self.FIELDS:
+            if key == "status" and type(value) is str:
+                value = sys.intern(value)
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self.FIELDS:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self._extra is not None:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        if key in self.FIELDS:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self):
+        for key in self.__slots__:
+            if key in self.FIELDS and hasattr(self, key):
+                yield key
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+
+
+class DatedRecord(Record):
+    """A record whose "date" is a timestamp, parsed the first time it is read"""
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if key == "date" and isinstance(value, str):
+            try:
+                value = datetime.strptime(value, DATE_FORMAT)
+            except ValueError:
+                # Handle invalid date format
+                value = datetime.now()
+            self.date = value
+        return value
+
+
+class SessionRecord(Record):
+    __slots__ = ("id", "title", "date", "time", "type", "agenda", "status", "_version", "_start")
+    FIELDS = frozenset(("id", "title", "date", "time", "type", "agenda", "status", "_version"))
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        if key in ("date", "time"):
+            self._start = None
+
+    @property
+    def start(self):
+        """Start of the session as a datetime, None if date or time is invalid"""
+        start = getattr(self, "_start", None)
+        if start is None:
+            try:
+                start = datetime.strptime(f"{self.date} {self.time}", "%Y-%m-%d %H:%M")
+            except (AttributeError, ValueError):
+                return None
+            self._start = start
+        return start
+
+
+class MotionRecord(DatedRecord):
+    __slots__ = ("id", "title", "type", "text", "created_by", "date", "status",
+                 "needs_approval", "_version")
+    FIELDS = frozenset(__slots__)
+
+
+class VoteRecord(Record):
+    __slots__ = ("id", "title", "description", "votes", "created_by", "date", "status",
+                 "needs_approval", "_version")
+    FIELDS = frozenset(__slots__)
+
+
+class BillRecord(DatedRecord):
+    __slots__ = ("id", "title", "type", "description", "document", "created_by", "date",
+                 "status", "needs_approval", "_version")
+    FIELDS = frozenset(__slots__)
+
+
+RECORD_TYPES = {
+    "sessions": SessionRecord,
+    "motions": MotionRecord,
+    "votes": VoteRecord,
+    "bills": BillRecord
+}
+
+
+def make_record(collection, data):
+    """The record class instance for a collection, from a dict or record"""
+    record_type = RECORD_TYPES[collection]
+    if type(data) is record_type:
+        return data
+    return record_type(data)
@@ -329,10 +329,9 @@ class ScheduleSessionDialog:
             # Add session through data manager
             session_id = self.data_manager.add_session(session_data)  # Use data_manager directly
             
-            # Update dashboard if available
-            if hasattr(self.parent, "update_dashboard"):
-                self.parent.update_dashboard()
-                
+            # Views showing sessions subscribe to the data manager and
+            # refresh themselves from the change event
+            
             messagebox.showinfo("Success", "Session scheduled successfully")
             self.dialog.destroy()
             
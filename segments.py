@@ -0,0 +1,379 @@
+import json
+import os
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from datetime import datetime
+from json_stream import iter_json_object
+
+# Collections split into yearly segments. Sessions are few and are needed
+# whole by the calendar, so they stay in a single file
+SEGMENTED = ("motions", "votes", "bills")
+
+# Cold records kept in memory before least recently used segments are
+# dropped again
+DEFAULT_BUDGET = 10000
+
+
+def segment_of(record):
+    """Year a record belongs to, from its "date", None if it has none"""
+    date = record.get("date")
+    if isinstance(date, datetime):
+        return date.year
+    if isinstance(date, str) and date[:4].isdigit():
+        return int(date[:4])
+    return None
+
+
+class SegmentedStore:
+    """JSON storage that keeps only the current year of each collection hot.
+
+    data/<collection>.json holds the records of the current year (and any
+    without a date). Older records move to data/archive/<collection>/<year>.json
+    and are listed in data/archive/<collection>/index.json with the fields
+    the DataManager indexes, so they are only read when actually used.
+    Collections that aren't segmented are handed to the plain JsonStore.
+    """
+
+    rewrites_collection = True
+    # A snapshot would load every segment back into memory, see signature()
+    snapshots = False
+
+    def __init__(self, json_store, encoder=None, budget=DEFAULT_BUDGET, current=None,
+                 file_lock=None):
+        self.json_store = json_store
+        # The FileLock of a shared data directory, archiving rewrites the
+        # hot file and must not race another workstation's write to it
+        self.file_lock = file_lock
+        self.data_dir = json_store.data_dir
+        self.encoder = encoder
+        self.budget = budget
+        self.current = current or datetime.now().year
+        self.tables = {}
+
+    def archive_dir(self, name):
+        return os.path.join(self.data_dir, "archive", name)
+
+    def segment_path(self, name, segment):
+        return os.path.join(self.archive_dir(name), f"{segment}.json")
+
+    def index_path(self, name):
+        return os.path.join(self.archive_dir(name), "index.json")
+
+    def load(self, name):
+        return dict(self.iter_load(name))
+
+    def iter_load(self, name):
+        """Hot records plus the cold ones currently in memory, as on disk"""
+        yield from self.json_store.iter_load(name)
+        table = self.tables.get(name)
+        if table is not None:
+            for segment in list(table.loaded_segments()):
+                yield from self.read_segment(name, segment).items()
+
+    def read_segment(self, name, segment):
+        path = self.segment_path(name, segment)
+        if not os.path.exists(path):
+            return {}
+        return dict(iter_json_object(path))
+
+    def refresh(self, name):
+        """Take the index rows another workstation changed, see
+        SegmentedTable.refresh_index()"""
+        table = self.tables.get(name)
+        if table is None:
+            return []
+        return table.refresh_index(self.read_index(name))
+
+    def read_index(self, name):
+        path = self.index_path(name)
+        if not os.path.exists(path):
+            return {}
+        return dict(iter_json_object(path))
+
+    def table(self, name, factory):
+        """A SegmentedTable over a collection, None if it isn't segmented"""
+        if name not in SEGMENTED:
+            return None
+
+        hot, moved = self._split(name, factory)
+        if moved and self._lock_archive():
+            # Records whose year is over, e.g. after new year or on first
+            # use with an unsegmented data directory, go to the archive.
+            # Read again under the lock, the hot file may have changed
+            try:
+                hot, moved = self._split(name, factory)
+                index = self.read_index(name)
+                if moved:
+                    self.archive(name, hot, moved, index)
+            finally:
+                if self.file_lock:
+                    self.file_lock.release()
+        else:
+            index = self.read_index(name)
+            # Another workstation holds the lock: keep them hot for now,
+            # they are archived on a later load
+            for records in moved.values():
+                for record_id, record in records.items():
+                    hot[record_id] = factory(record)
+
+        table = SegmentedTable(self, name, hot, index, factory, self.budget)
+        self.tables[name] = table
+        return table
+
+    def _split(self, name, factory):
+        """Records of the hot file: (this year's, {past year: records})"""
+        hot = {}
+        moved = {}
+        for record_id, record in self.json_store.iter_load(name):
+            segment = segment_of(record)
+            if segment is None or segment >= self.current:
+                hot[record_id] = factory(record)
+            else:
+                moved.setdefault(segment, {})[record_id] = record
+        return hot, moved
+
+    def _lock_archive(self):
+        # Collections are loaded with the DataManager's lock held; waiting
+        # for the file lock here could deadlock with a thread holding it
+        # and waiting for ours, so only take it if it is free
+        return self.file_lock is None or self.file_lock.acquire(blocking=False)
+
+    def archive(self, name, hot, moved, index):
+        os.makedirs(self.archive_dir(name), exist_ok=True)
+        for segment, records in moved.items():
+            # Moved records may already be in the segment from an
+            # interrupted archive run; theirs are the same records
+            segment_records = self.read_segment(name, segment)
+            segment_records.update(records)
+            self.write_file(self.segment_path(name, segment), segment_records)
+            for record_id, record in records.items():
+                index[record_id] = index_row(segment, record)
+        self.write_file(self.index_path(name), index)
+        # Only now drop them from the hot file, a crash before this leaves
+        # them in both places and they are simply archived again
+        self.json_store.write(name, json.dumps(
+            {record_id: dict(record) for record_id, record in hot.items()}, cls=self.encoder
+        ))
+
+    def serialize(self, name, records, record_ids):
+        if name not in SEGMENTED:
+            return self.json_store.serialize(name, records, record_ids)
+
+        # records is what SegmentedTable.segment_copies() returned
+        files = []
+        if records["hot"] is not None:
+            files.append((None, json.dumps(records["hot"], cls=self.encoder)))
+        for segment, segment_records in records["cold"].items():
+            files.append((
+                self.segment_path(name, segment),
+                json.dumps(segment_records, cls=self.encoder)
+            ))
+        if records["index"] is not None:
+            files.append((self.index_path(name), json.dumps(records["index"], cls=self.encoder)))
+        return files, records["segments"]
+
+    def write(self, name, content):
+        if name not in SEGMENTED:
+            self.json_store.write(name, content)
+            return
+
+        files, segments = content
+        os.makedirs(self.archive_dir(name), exist_ok=True)
+        # Segments before the index and the hot file last, as in archive()
+        for path, text in files:
+            if path is not None:
+                self.json_store.write_file(path, text)
+        for path, text in files:
+            if path is None:
+                self.json_store.write(name, text)
+        self.tables[name].written(segments)
+
+    def write_file(self, path, records):
+        self.json_store.write_file(path, json.dumps(records, cls=self.encoder))
+
+    def signature(self, name):
+        # A snapshot would load every segment back into memory
+        if name in SEGMENTED:
+            return None
+        return self.json_store.signature(name)
+
+    def change_token(self, name):
+        token = self.json_store.change_token(name)
+        if name not in SEGMENTED:
+            return token
+        # Every write to a cold segment rewrites the index as well
+        try:
+            stat = os.stat(self.index_path(name))
+            return (token, stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return (token, None)
+
+    def close(self):
+        self.json_store.close()
+
+
+def index_row(segment, record):
+    """What index.json keeps about a cold record: [segment, status, date, time]"""
+    date = record.get("date")
+    if isinstance(date, datetime):
+        date = date.strftime("%Y-%m-%d %H:%M:%S")
+    return [segment, record.get("status"), date, record.get("time")]
+
+
+class SegmentedTable(MutableMapping):
+    """A collection whose older years are read from disk when first used.
+
+    Behaves like the dict it replaces. Cold segments are loaded whole on
+    the first access to one of their records and dropped again, least
+    recently used first, once more than 'budget' cold records are held.
+    Segments with unsaved changes are never dropped.
+    """
+
+    def __init__(self, store, name, hot, index, factory, budget):
+        self.store = store
+        self.name = name
+        self.factory = factory
+        self.budget = budget
+        self._hot = hot
+        # Cold record id -> [segment, status, date, time]
+        self._index = index
+        for record_id in hot:
+            self._index.pop(record_id, None)
+        # segment -> {id: record}, most recently used last
+        self._segments = OrderedDict()
+        # Segments copied for a write that hasn't finished yet
+        self._writing = set()
+        # Set by DataManager: IDs with changes not yet handed to a write
+        self.dirty = set()
+        # Set by DataManager: IDs changed inside a transaction, which are
+        # only marked dirty once it commits
+        self.pinned = set()
+
+    def __getitem__(self, record_id):
+        record = self._hot.get(record_id)
+        if record is not None:
+            return record
+        row = self._index.get(record_id)
+        if row is None:
+            raise KeyError(record_id)
+        return self._segment(row[0])[record_id]
+
+    def __setitem__(self, record_id, record):
+        if record_id in self._index:
+            self._segment(self._index[record_id][0])[record_id] = record
+            return
+        segment = segment_of(record)
+        if record_id in self._hot or segment is None or segment >= self.store.current:
+            self._hot[record_id] = record
+            return
+        # A new record from an earlier year, e.g. an imported old bill
+        self._segment(segment)[record_id] = record
+        self._index[record_id] = index_row(segment, record)
+
+    def __delitem__(self, record_id):
+        if record_id in self._hot:
+            del self._hot[record_id]
+            return
+        row = self._index.pop(record_id)
+        self._segment(row[0]).pop(record_id, None)
+
+    def __iter__(self):
+        yield from self._hot
+        yield from self._index
+
+    def __len__(self):
+        return len(self._hot) + len(self._index)
+
+    def __contains__(self, record_id):
+        return record_id in self._hot or record_id in self._index
+
+    def loaded_segments(self):
+        return self._segments.keys()
+
+    def index_items(self):
+        """(id, fields) pairs with just the indexed fields, loading nothing"""
+        yield from self._hot.items()
+        for record_id, (segment, status, date, time) in self._index.items():
+            records = self._segments.get(segment)
+            if records is not None and record_id in records:
+                yield record_id, records[record_id]
+            else:
+                yield record_id, {"status": status, "date": date, "time": time}
+
+    def refresh_index(self, index):
+        """Take a fresh index.json into account.
+
+        Rows of cold records in segments that aren't in memory are
+        replaced; returns (id, old status, new status, added) for each that
+        changed. Records of segments in memory are re-read from their
+        segment and merged by version instead, see SegmentedStore.iter_load().
+        """
+        changes = []
+        for record_id, row in index.items():
+            if record_id in self._hot or row[0] in self._segments:
+                continue
+            old = self._index.get(record_id)
+            if old is not None and list(old) == list(row):
+                continue
+            self._index[record_id] = row
+            if old is None:
+                changes.append((record_id, None, row[1], True))
+            else:
+                changes.append((record_id, old[1], row[1], False))
+        return changes
+
+    def _segment(self, segment):
+        records = self._segments.get(segment)
+        if records is None:
+            records = {
+                record_id: self.factory(record)
+                for record_id, record in self.store.read_segment(self.name, segment).items()
+            }
+            self._segments[segment] = records
+            self._evict(keep=segment)
+        else:
+            self._segments.move_to_end(segment)
+        return records
+
+    def _evict(self, keep):
+        resident = sum(len(records) for records in self._segments.values())
+        for segment in list(self._segments):
+            if resident <= self.budget:
+                break
+            if segment == keep or segment in self._writing:
+                continue
+            records = self._segments[segment]
+            if any(record_id in self.dirty or record_id in self.pinned for record_id in records):
+                continue
+            del self._segments[segment]
+            resident -= len(records)
+
+    def segment_copies(self, record_ids):
+        """Copies of the hot file and of every segment holding one of
+        record_ids, in the form SegmentedStore.serialize() expects"""
+        hot = None
+        cold = {}
+        for record_id in record_ids:
+            if record_id in self._hot:
+                hot = True
+            elif record_id in self._index:
+                cold.setdefault(self._index[record_id][0], None)
+
+        for segment in cold:
+            records = self._segment(segment)
+            cold[segment] = {record_id: dict(record) for record_id, record in records.items()}
+            # Statuses may have changed in place since the row was written
+            for record_id, record in records.items():
+                self._index[record_id] = index_row(segment, record)
+        self._writing.update(cold)
+
+        return {
+            "hot": {rid: dict(record) for rid, record in self._hot.items()} if hot else None,
+            "cold": cold,
+            "index": {rid: list(row) for rid, row in self._index.items()} if cold else None,
+            "segments": list(cold)
+        }
+
+    def written(self, segments):
+        """The given segments are on disk, they may be dropped again"""
+        self._writing.difference_update(segments)
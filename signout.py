@@ -16,6 +16,10 @@ class SignOut:
             # Get the root window
             root = dashboard.winfo_toplevel()
             
+            # Write out anything still queued before leaving the session
+            if getattr(dashboard, "data_manager", None):
+                dashboard.data_manager.flush()
+            
             # Destroy current dashboard
             dashboard.destroy()
             
@@ -0,0 +1,536 @@
+import mmap
+import os
+import struct
+from bisect import bisect_left
+from collections.abc import Mapping, MutableMapping, Sequence
+from datetime import datetime
+
+# File layout (all integers little endian):
+#
+#   header     magic, format version, collection count, offsets of the
+#              string pool, the record key table and the records
+#   directory  per collection: name, store signature, record count,
+#              offsets of its record table, ID order and status index
+#   tables     per collection:
+#                rows      per record, a fixed width row (see ROW) pointing
+#                          at the record bytes and its id/status/date/time
+#                          strings, in the order of the collection
+#                order     row numbers sorted by record ID (u32 each), for
+#                          looking IDs up by bisection
+#                statuses  group count, then per status: its string, the
+#                          number of rows and their row numbers, ascending
+#   strings    string pool shared by every table
+#   keys       field names used by the records, referenced by index
+#   records    encoded records (see encode_value)
+#
+# Only the header and directory are read when a snapshot is opened.
+# Nothing is read per record until it is used: IDs are looked up in the
+# order table, the status index is read straight from the mapping, and
+# each record is decoded only when it is looked up.
+
+MAGIC = b"HOAASNAP"
+VERSION = 2
+
+HEADER = struct.Struct("<8sHHQQQ")
+DIRECTORY_ENTRY = struct.Struct("<qqIQQQ")
+ROW = struct.Struct("<IIIIQI")
+NO_STRING = 0xFFFFFFFF
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Value tags of the record encoding
+NONE, TRUE, FALSE, INT, FLOAT, STRING, DATETIME, LIST, DICT = b"NTFifsdlm"
+U32 = struct.Struct("<I")
+F64 = struct.Struct("<d")
+DT = struct.Struct("<HBBBBBI")
+
+class SnapshotError(Exception):
+    pass
+
+def _write_varint(number, out):
+    # Unsigned LEB128: seven bits per byte, high bit set on all but the last
+    while number >= 0x80:
+        out.append((number & 0x7F) | 0x80)
+        number >>= 7
+    out.append(number)
+
+def _read_varint(buffer, offset):
+    number = shift = 0
+    while True:
+        byte = buffer[offset]
+        offset += 1
+        number |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return number, offset
+        shift += 7
+
+def encode_value(value, out, keys):
+    """Append the binary encoding of a JSON-like value to bytearray out.
+
+    Lengths and integers are varints, and dict keys are written as indexes
+    into 'keys' (key -> index, extended as new keys are seen), since the
+    same few field names repeat in every record.
+    """
+    if value is None:
+        out.append(NONE)
+    elif value is True:
+        out.append(TRUE)
+    elif value is False:
+        out.append(FALSE)
+    elif isinstance(value, int):
+        out.append(INT)
+        # Zigzag so small negative numbers stay short
+        _write_varint(value * 2 if value >= 0 else -value * 2 - 1, out)
+    elif isinstance(value, float):
+        out.append(FLOAT)
+        out += F64.pack(value)
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+        out.append(STRING)
+        _write_varint(len(data), out)
+        out += data
+    elif isinstance(value, datetime):
+        out.append(DATETIME)
+        out += DT.pack(value.year, value.month, value.day, value.hour,
+                       value.minute, value.second, value.microsecond)
+    elif isinstance(value, (list, tuple)):
+        out.append(LIST)
+        _write_varint(len(value), out)
+        for item in value:
+            encode_value(item, out, keys)
+    elif isinstance(value, Mapping):
+        out.append(DICT)
+        _write_varint(len(value), out)
+        for key, item in value.items():
+            key = str(key)
+            if key not in keys:
+                keys[key] = len(keys)
+            _write_varint(keys[key], out)
+            encode_value(item, out, keys)
+    else:
+        raise SnapshotError(f"Cannot encode {type(value).__name__} in a snapshot")
+
+def decode_value(buffer, offset, keys):
+    """Decode one value at offset, returns (value, offset after it)"""
+    tag = buffer[offset]
+    offset += 1
+    if tag == NONE:
+        return None, offset
+    if tag == TRUE:
+        return True, offset
+    if tag == FALSE:
+        return False, offset
+    if tag == INT:
+        number, offset = _read_varint(buffer, offset)
+        return (number >> 1) if not number & 1 else -((number + 1) >> 1), offset
+    if tag == FLOAT:
+        return F64.unpack_from(buffer, offset)[0], offset + F64.size
+    if tag == STRING:
+        length, offset = _read_varint(buffer, offset)
+        return bytes(buffer[offset:offset + length]).decode("utf-8"), offset + length
+    if tag == DATETIME:
+        return datetime(*DT.unpack_from(buffer, offset)), offset + DT.size
+    if tag == LIST:
+        count, offset = _read_varint(buffer, offset)
+        items = []
+        for _ in range(count):
+            item, offset = decode_value(buffer, offset, keys)
+            items.append(item)
+        return items, offset
+    if tag == DICT:
+        count, offset = _read_varint(buffer, offset)
+        items = {}
+        for _ in range(count):
+            key, offset = _read_varint(buffer, offset)
+            items[keys[key]], offset = decode_value(buffer, offset, keys)
+        return items, offset
+    raise SnapshotError(f"Unknown value tag {tag!r} at offset {offset - 1}")
+
+def write_snapshot(path, collections, signatures):
+    """Write collections ({name: {id: record}}) to a snapshot file.
+
+    signatures maps each collection to the signature of the store file it
+    was taken from, so a stale snapshot can be detected when it is opened.
+    """
+    strings = bytearray()
+    string_offsets = {}
+
+    def pool(text):
+        if text is None:
+            return NO_STRING
+        if isinstance(text, datetime):
+            text = text.strftime(DATE_FORMAT)
+        text = str(text)
+        if text not in string_offsets:
+            data = text.encode("utf-8")
+            string_offsets[text] = len(strings)
+            strings.extend(U32.pack(len(data)) + data)
+        return string_offsets[text]
+
+    records = bytearray()
+    keys = {}
+    tables = []
+    for name, items in collections.items():
+        rows = bytearray()
+        statuses = {}
+        for position, (record_id, record) in enumerate(items.items()):
+            start = len(records)
+            encode_value(record, records, keys)
+            status = record.get("status")
+            statuses.setdefault(status, []).append(position)
+            rows += ROW.pack(
+                pool(record_id),
+                pool(status),
+                pool(record.get("date")),
+                pool(record.get("time")),
+                start,
+                len(records) - start
+            )
+
+        ids = list(items)
+        order = bytearray()
+        for position in sorted(range(len(ids)), key=ids.__getitem__):
+            order += U32.pack(position)
+
+        groups = bytearray(U32.pack(len(statuses)))
+        for status, positions in statuses.items():
+            groups += U32.pack(pool(status)) + U32.pack(len(positions))
+            groups += struct.pack(f"<{len(positions)}I", *positions)
+        tables.append((name, len(items), (rows, order, groups)))
+
+    # Lay out the file: header, directory, tables, strings, records
+    directory_size = sum(
+        U32.size + len(name.encode()) + DIRECTORY_ENTRY.size for name, _, _ in tables
+    )
+    table_offset = HEADER.size + directory_size
+    directory = bytearray()
+    for name, count, (rows, order, groups) in tables:
+        signature = signatures.get(name) or (-1, -1)
+        data = name.encode()
+        order_offset = table_offset + len(rows)
+        groups_offset = order_offset + len(order)
+        directory += U32.pack(len(data)) + data
+        directory += DIRECTORY_ENTRY.pack(
+            signature[0], signature[1], count, table_offset, order_offset, groups_offset
+        )
+        table_offset = groups_offset + len(groups)
+
+    key_table = bytearray()
+    _write_varint(len(keys), key_table)
+    for key in keys:
+        data = key.encode("utf-8")
+        _write_varint(len(data), key_table)
+        key_table += data
+
+    strings_offset = table_offset
+    keys_offset = strings_offset + len(strings)
+    records_offset = keys_offset + len(key_table)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(tables), strings_offset, keys_offset, records_offset))
+        f.write(directory)
+        for _, _, sections in tables:
+            for section in sections:
+                f.write(section)
+        f.write(strings)
+        f.write(key_table)
+        f.write(records)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class SnapshotReader:
+    """Memory mapped view of a snapshot file"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count, self.strings_offset, keys_offset, self.records_offset = \
+            HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC:
+            raise SnapshotError(f"{path} is not a snapshot file")
+        if version != VERSION:
+            raise SnapshotError(f"Unsupported snapshot version {version}")
+
+        self.keys = []
+        total, offset = _read_varint(self.buffer, keys_offset)
+        for _ in range(total):
+            length, offset = _read_varint(self.buffer, offset)
+            self.keys.append(bytes(self.buffer[offset:offset + length]).decode("utf-8"))
+            offset += length
+
+        self.collections = {}
+        offset = HEADER.size
+        for _ in range(count):
+            length = U32.unpack_from(self.buffer, offset)[0]
+            offset += U32.size
+            name = bytes(self.buffer[offset:offset + length]).decode()
+            offset += length
+            mtime, size, records, table, order, groups = \
+                DIRECTORY_ENTRY.unpack_from(self.buffer, offset)
+            offset += DIRECTORY_ENTRY.size
+            signature = None if mtime < 0 else (mtime, size)
+            self.collections[name] = (signature, records, table, order, groups)
+
+    def signature(self, name):
+        return self.collections[name][0]
+
+    def count(self, name):
+        return self.collections[name][1]
+
+    def string(self, offset):
+        if offset == NO_STRING:
+            return None
+        offset += self.strings_offset
+        length = U32.unpack_from(self.buffer, offset)[0]
+        offset += U32.size
+        return bytes(self.buffer[offset:offset + length]).decode("utf-8")
+
+    def rows(self, name):
+        _, count, table, _, _ = self.collections[name]
+        end = table + count * ROW.size
+        return ROW.iter_unpack(self.buffer[table:end])
+
+    def row(self, name, position):
+        return ROW.unpack_from(self.buffer, self.collections[name][2] + position * ROW.size)
+
+    def record_id(self, name, position):
+        return self.string(self.row(name, position)[0])
+
+    def find(self, name, record_id):
+        """Row number of a record ID, None if the snapshot doesn't have it"""
+        if not isinstance(record_id, str):
+            return None
+        _, count, _, order, _ = self.collections[name]
+        positions = U32Array(self.buffer, order, count)
+        ids = _SortedIds(self, name, positions)
+        i = bisect_left(ids, record_id)
+        if i < count and ids[i] == record_id:
+            return positions[i]
+        return None
+
+    def status_groups(self, name):
+        """status -> U32Array of the row numbers holding it"""
+        offset = self.collections[name][4]
+        count = U32.unpack_from(self.buffer, offset)[0]
+        offset += U32.size
+        groups = {}
+        for _ in range(count):
+            status_ref, rows = struct.unpack_from("<II", self.buffer, offset)
+            offset += 2 * U32.size
+            groups[self.string(status_ref)] = U32Array(self.buffer, offset, rows)
+            offset += rows * U32.size
+        return groups
+
+    def record(self, offset, length):
+        start = self.records_offset + offset
+        value, _ = decode_value(self.buffer, start, self.keys)
+        return value
+
+    def table(self, name, factory=None):
+        return SnapshotTable(self, name, factory)
+
+    def close(self):
+        self.buffer.close()
+
+class U32Array(Sequence):
+    """Array of little endian u32 read straight from the mapping"""
+
+    def __init__(self, buffer, offset, count):
+        self.buffer = buffer
+        self.offset = offset
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        return U32.unpack_from(self.buffer, self.offset + i * U32.size)[0]
+
+    def __iter__(self):
+        end = self.offset + self.count * U32.size
+        for (value,) in U32.iter_unpack(self.buffer[self.offset:end]):
+            yield value
+
+    def __contains__(self, value):
+        i = bisect_left(self, value)
+        return i < self.count and self[i] == value
+
+class _SortedIds(Sequence):
+    # Record IDs in sorted order, decoded as bisect_left asks for them
+    def __init__(self, reader, name, positions):
+        self.reader = reader
+        self.name = name
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, i):
+        return self.reader.record_id(self.name, self.positions[i])
+
+class SnapshotTable(MutableMapping):
+    """A collection backed by a snapshot, decoding records on first access.
+
+    Opening one reads nothing: IDs are looked up by bisection in the
+    snapshot's sorted ID table and records are decoded when first used.
+    Records that are added, changed or removed are tracked in memory on
+    top of the snapshot, so the table behaves like the plain dict it
+    replaces.
+    """
+
+    def __init__(self, reader, name, factory=None):
+        self.reader = reader
+        self.name = name
+        # Turns a decoded dict into the record type the caller keeps
+        self.factory = factory
+        self._count = reader.count(name)
+        # Records decoded or set since opening, by ID
+        self._records = {}
+        # IDs the snapshot doesn't have (an ordered set) and snapshot IDs
+        # that were deleted
+        self._added = {}
+        self._deleted = set()
+        # ID -> row number, or None when not in the snapshot
+        self._positions = {}
+
+    def position(self, record_id):
+        """Row number of a record in the snapshot, None if it isn't there"""
+        try:
+            return self._positions[record_id]
+        except KeyError:
+            position = self._positions[record_id] = self.reader.find(self.name, record_id)
+            return position
+        except TypeError:
+            return None
+
+    def __getitem__(self, record_id):
+        record = self._records.get(record_id)
+        if record is None:
+            if record_id in self._deleted:
+                raise KeyError(record_id)
+            position = self.position(record_id)
+            if position is None:
+                raise KeyError(record_id)
+            _, _, _, _, offset, length = self.reader.row(self.name, position)
+            record = self.reader.record(offset, length)
+            if self.factory:
+                record = self.factory(record)
+            self._records[record_id] = record
+        return record
+
+    def __setitem__(self, record_id, record):
+        if record_id in self._deleted:
+            self._deleted.discard(record_id)
+        elif record_id not in self._added and self.position(record_id) is None:
+            self._added[record_id] = None
+        self._records[record_id] = record
+
+    def __delitem__(self, record_id):
+        if record_id in self._added:
+            del self._added[record_id]
+        elif record_id not in self._deleted and self.position(record_id) is not None:
+            self._deleted.add(record_id)
+        else:
+            raise KeyError(record_id)
+        self._records.pop(record_id, None)
+
+    def __iter__(self):
+        for position in range(self._count):
+            record_id = self.reader.record_id(self.name, position)
+            # Saves the bisection when the caller looks the record up next
+            self._positions[record_id] = position
+            if record_id not in self._deleted:
+                yield record_id
+        yield from list(self._added)
+
+    def __len__(self):
+        return self._count - len(self._deleted) + len(self._added)
+
+    def __contains__(self, record_id):
+        if record_id in self._added:
+            return True
+        return record_id not in self._deleted and self.position(record_id) is not None
+
+    def status_index(self):
+        """status -> IDs as in DataManager's status index, read from the
+        snapshot as they are used; valid until the table changes"""
+        return {
+            status: SnapshotIds(self, positions)
+            for status, positions in self.reader.status_groups(self.name).items()
+        }
+
+    def index_items(self):
+        """(id, fields) pairs with just the indexed fields, decoding nothing"""
+        string = self.reader.string
+        for record_id, status_ref, date_ref, time_ref, _, _ in self.reader.rows(self.name):
+            record_id = string(record_id)
+            if record_id in self._deleted:
+                continue
+            if record_id in self._records:
+                yield record_id, self._records[record_id]
+                continue
+            yield record_id, {
+                "status": string(status_ref),
+                "date": string(date_ref),
+                "time": string(time_ref)
+            }
+        for record_id in list(self._added):
+            yield record_id, self._records[record_id]
+
+class SnapshotIds(MutableMapping):
+    """The IDs of a snapshot table with one status, as the {id: None}
+    dict the DataManager keeps per status.
+
+    The rows come from the snapshot's status index; IDs added and removed
+    since are tracked on top, in the same way as SnapshotTable does.
+    """
+
+    def __init__(self, table, positions):
+        self.table = table
+        self.positions = positions
+        self._added = {}
+        self._removed = set()
+
+    def _in_snapshot(self, record_id):
+        position = self.table.position(record_id)
+        return position is not None and position in self.positions
+
+    def __getitem__(self, record_id):
+        if record_id in self._added or (
+                record_id not in self._removed and self._in_snapshot(record_id)):
+            return None
+        raise KeyError(record_id)
+
+    def __setitem__(self, record_id, value):
+        if record_id in self._removed:
+            self._removed.discard(record_id)
+        elif record_id not in self._added and not self._in_snapshot(record_id):
+            self._added[record_id] = None
+
+    def __delitem__(self, record_id):
+        if record_id in self._added:
+            del self._added[record_id]
+        elif record_id not in self._removed and self._in_snapshot(record_id):
+            self._removed.add(record_id)
+        else:
+            raise KeyError(record_id)
+
+    def __iter__(self):
+        record_id = self.table.reader.record_id
+        name = self.table.name
+        known = self.table._positions
+        for position in self.positions:
+            row_id = record_id(name, position)
+            known[row_id] = position
+            if row_id not in self._removed:
+                yield row_id
+        yield from list(self._added)
+
+    def __len__(self):
+        return len(self.positions) - len(self._removed) + len(self._added)
@@ -0,0 +1,187 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from journal import Journal
+from json_stream import iter_json_object
+
+# Every collection gets the same table layout: the record itself is kept as
+# JSON, with the columns we filter and sort on pulled out and indexed
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS {table} (
+    id TEXT PRIMARY KEY,
+    status TEXT,
+    date TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_{table}_status ON {table} (status);
+CREATE INDEX IF NOT EXISTS idx_{table}_date ON {table} (date);
+"""
+
+class SQLiteStore:
+    """SQLite storage engine for DataManager collections"""
+
+    # Rows are upserted one by one, only changed records need serializing
+    rewrites_collection = False
+    # Rows change in place, see signature()
+    snapshots = False
+
+    def __init__(self, path, collections, encoder=None):
+        self.path = path
+        self.collections = collections
+        self.encoder = encoder
+        self._lock = threading.Lock()
+
+        is_new = not os.path.exists(path)
+        # Writes may come from the journal compactor thread
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            for name in collections:
+                self.conn.executescript(SCHEMA.format(table=name))
+
+        # Bring existing JSON data across the first time the database is used
+        if is_new:
+            self.migrate_from_json(os.path.dirname(path) or ".")
+
+    def load(self, name):
+        return dict(self.iter_load(name))
+
+    def iter_load(self, name, batch_size=500):
+        """Yield (id, record) pairs, fetching rows a batch at a time"""
+        with self._lock:
+            cursor = self.conn.execute(f"SELECT id, data FROM {name}")
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for record_id, data in rows:
+                    yield record_id, json.loads(data)
+
+    def signature(self, name):
+        # Rows change in place, there is no cheap way to tell if a copy is current
+        return None
+
+    def change_token(self, name):
+        """Changes whenever another connection commits to the database"""
+        with self._lock:
+            return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def serialize(self, name, records, record_ids):
+        """Build the rows for the given records, ready for write()"""
+        rows = []
+        for record_id in record_ids:
+            if record_id not in records:
+                continue
+            record = records[record_id]
+            rows.append((
+                record_id,
+                record.get("status"),
+                self._date_key(name, record),
+                json.dumps(record, cls=self.encoder)
+            ))
+        return rows
+
+    def write(self, name, rows):
+        # Only the changed rows are written, all in one transaction
+        with self._lock, self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO {name} (id, status, date, data) VALUES (?, ?, ?, ?)",
+                rows
+            )
+
+    def query(self, name, status=None, start=None, end=None, exclude=None):
+        """Fetch records by status and/or date range using the indexes"""
+        clauses, params = self._status_clauses(status, exclude)
+        if start is not None:
+            clauses.append("date >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("date <= ?")
+            params.append(end)
+
+        sql = f"SELECT id, data FROM {name}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY date"
+
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return {record_id: json.loads(data) for record_id, data in rows}
+
+    def count(self, name, status=None, exclude=None):
+        clauses, params = self._status_clauses(status, exclude)
+        sql = f"SELECT COUNT(*) FROM {name}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        with self._lock:
+            row = self.conn.execute(sql, params).fetchone()
+        return row[0]
+
+    def status_counts(self, name):
+        """status -> number of records, counted from the status index"""
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT status, COUNT(*) FROM {name} GROUP BY status"
+            ).fetchall()
+        return dict(rows)
+
+    def _status_clauses(self, status, exclude):
+        clauses, params = [], []
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        if exclude is not None:
+            # Records without a status aren't excluded, as in DataManager
+            clauses.append("(status IS NULL OR status != ?)")
+            params.append(exclude)
+        return clauses, params
+
+    def migrate_from_json(self, data_dir="data"):
+        """Copy the records from data_dir/<collection>.json into the database"""
+        collections = {}
+        for name in self.collections:
+            path = os.path.join(data_dir, f"{name}.json")
+            if not os.path.exists(path):
+                continue
+            try:
+                collections[name] = dict(iter_json_object(path))
+            except Exception as e:
+                print(f"Error migrating {name}: {str(e)}")
+
+        # Mutations not yet compacted out of a journaled data directory
+        journal = Journal(os.path.join(data_dir, "journal.log"))
+        for entry in journal.replay():
+            records = collections.setdefault(entry["collection"], {})
+            if entry["op"] == "put":
+                records[entry["id"]] = entry["record"]
+            elif entry["op"] == "update" and entry["id"] in records:
+                records[entry["id"]].update(entry["fields"])
+
+        migrated = {}
+        for name, records in collections.items():
+            self.write(name, self.serialize(name, records, records.keys()))
+            migrated[name] = len(records)
+        return migrated
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def _date_key(self, name, record):
+        # Sessions keep date and time apart, everything else has a timestamp
+        if name == "sessions":
+            return f"{record.get('date', '')} {record.get('time', '')}".strip()
+        date = record.get("date")
+        if isinstance(date, datetime):
+            return date.strftime("%Y-%m-%d %H:%M:%S")
+        return date
+
+if __name__ == "__main__":
+    from data_manager import COLLECTIONS, DateTimeEncoder
+
+    store = SQLiteStore("data/hoaa.db", COLLECTIONS, encoder=DateTimeEncoder)
+    for name, total in store.migrate_from_json("data").items():
+        print(f"Migrated {total} {name}")
+    store.close()